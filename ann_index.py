@@ -0,0 +1,139 @@
+"""Nearest-neighbour search over the normalized menu embedding matrix.
+
+Two interchangeable index types share the same search(query, k) interface:
+
+- ExactIndex scores every row, used for small menus.
+- IVFIndex clusters the rows with spherical k-means and only scores the
+  nprobe closest clusters, so query cost grows with sqrt(N) instead of N.
+  nlist and nprobe are the recall/latency knobs.
+
+Indexes only hold row ids, the vectors themselves stay in the embedding store.
+"""
+import os
+import zipfile
+
+import numpy as np
+
+INDEX_KIND = os.getenv("ANN_INDEX", "auto")  # auto, exact or ivf
+EXACT_SEARCH_MAX_ITEMS = int(os.getenv("ANN_EXACT_MAX_ITEMS", "20000"))
+DEFAULT_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+
+
+def top_k_indices(scores, k: int):
+    """Indices of the k highest scores, highest first, without a full sort."""
+    k = max(1, int(k))  # argpartition(scores, -0)[-0:] would select everything
+    if scores.shape[0] > k:
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(scores.shape[0])
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class ExactIndex:
+    kind = "exact"
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    @classmethod
+    def build(cls, matrix, **kwargs):
+        return cls(matrix)
+
+    def search(self, query, k: int):
+        scores = self.matrix @ query
+        ids = top_k_indices(scores, k)
+        return ids, scores[ids]
+
+    def save(self, path):
+        np.savez(path, kind=self.kind)
+
+    @classmethod
+    def load(cls, data, matrix):
+        return cls(matrix)
+
+
+class IVFIndex:
+    kind = "ivf"
+
+    def __init__(self, matrix, centroids, offsets, list_ids, nprobe=DEFAULT_NPROBE):
+        self.matrix = matrix
+        self.centroids = centroids
+        self.offsets = offsets  # Rows of cluster c are list_ids[offsets[c]:offsets[c + 1]]
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, matrix, nlist: int = None, nprobe: int = DEFAULT_NPROBE,
+              iterations: int = 10, sample_per_list: int = 64, seed: int = 0):
+        n = matrix.shape[0]
+        nlist = max(1, min(n, nlist or int(4 * np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+
+        # Train centroids on a sample, the catalog itself can be too big for k-means
+        sample_size = min(n, nlist * sample_per_list)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            empty = np.bincount(assign, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]  # Reseed empty clusters
+            centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+
+        assign = _assign(matrix, centroids)
+        list_ids = np.argsort(assign, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+        return cls(matrix, centroids.astype(np.float32), offsets, list_ids, nprobe)
+
+    def search(self, query, k: int, nprobe: int = None):
+        probe = top_k_indices(self.centroids @ query, nprobe or self.nprobe)
+        ids = np.concatenate([self.list_ids[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+        scores = self.matrix[ids] @ query
+        top = top_k_indices(scores, k)
+        return ids[top], scores[top]
+
+    def save(self, path):
+        np.savez(path, kind=self.kind, centroids=self.centroids, offsets=self.offsets,
+                 list_ids=self.list_ids, nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, data, matrix):
+        return cls(matrix, data["centroids"], data["offsets"], data["list_ids"], int(data["nprobe"]))
+
+
+INDEX_TYPES = {cls.kind: cls for cls in (ExactIndex, IVFIndex)}
+
+
+def _assign(vectors, centroids, chunk_size=65536):
+    # Nearest centroid for every row, in chunks to bound the score matrix size
+    return np.concatenate([
+        np.argmax(np.asarray(vectors[i:i + chunk_size]) @ centroids.T, axis=1)
+        for i in range(0, vectors.shape[0], chunk_size)
+    ]) if vectors.shape[0] else np.zeros(0, dtype=np.int64)
+
+
+def build_index(matrix, kind: str = INDEX_KIND, **kwargs):
+    if kind == "auto":
+        kind = "exact" if matrix.shape[0] <= EXACT_SEARCH_MAX_ITEMS else "ivf"
+    return INDEX_TYPES[kind].build(matrix, **kwargs)
+
+
+def load_or_build_index(matrix, path: str, kind: str = INDEX_KIND, **kwargs):
+    """Load the index saved at path, or build it and save it there."""
+    try:
+        with np.load(path) as data:
+            index = INDEX_TYPES[str(data["kind"])].load(data, matrix)
+        if kind in ("auto", index.kind):
+            if index.kind == "ivf":
+                # nprobe is a query-time knob, the saved one must not override ANN_NPROBE
+                index.nprobe = kwargs.get("nprobe", DEFAULT_NPROBE)
+            return index
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass  # Missing or corrupt file, build it again
+
+    index = build_index(matrix, kind, **kwargs)
+    tmp_path = path + ".tmp.npz"
+    index.save(tmp_path)
+    os.replace(tmp_path, path)
+    return index
@@ -0,0 +1,75 @@
+"""Precomputed attribute index over foodlist.json for search_menu.
+
+Every value of the boolean/enum fields gets a bitset (np.packbits) of the
+items that have it, and avg_calories is kept as a sorted array. A search is
+then a few bitwise ANDs plus one binary search instead of a list scan per
+filter.
+"""
+import numpy as np
+
+BITSET_FIELDS = ("spicy", "seafood", "cuisine", "green_level", "meat")
+
+
+def _normalize(value):
+    return value.lower() if isinstance(value, str) else value
+
+
+class AttributeIndex:
+    def __init__(self, items):
+        self.items = items
+        self.size = len(items)
+
+        rows_by_value = {field: {} for field in BITSET_FIELDS}
+        for row, item in enumerate(items):
+            for field in BITSET_FIELDS:
+                values = item.get(field)
+                # meat is a list of meat types, other fields hold one value
+                for value in values if isinstance(values, list) else [values]:
+                    rows_by_value[field].setdefault(_normalize(value), []).append(row)
+
+        self.bitsets = {
+            field: {value: self._bitset(rows) for value, rows in values.items()}
+            for field, values in rows_by_value.items()
+        }
+        self.all_items = self._bitset(np.arange(self.size))
+        self.empty = self._bitset([])
+
+        calories = np.array([item.get("avg_calories", 0) for item in items], dtype=np.float64)
+        self.calorie_order = np.argsort(calories, kind="stable")
+        self.sorted_calories = calories[self.calorie_order]
+        self.calorie_rank = np.empty(self.size, dtype=np.int64)  # Position of every row in calorie order
+        self.calorie_rank[self.calorie_order] = np.arange(self.size)
+
+    def _bitset(self, rows):
+        mask = np.zeros(self.size, dtype=bool)
+        mask[np.asarray(rows, dtype=np.int64)] = True
+        return np.packbits(mask)
+
+    def _value_bitset(self, field, value):
+        return self.bitsets[field].get(_normalize(value), self.empty)
+
+    def mask(self, spicy: bool = None, seafood: bool = None, meat: str = None, cuisine: str = None,
+             green_level: str = None, max_calories: int = None):
+        """Bitset of the items matching every given filter (same rules as search_menu)."""
+        result = self.all_items
+        if spicy is not None:
+            result = result & self._value_bitset("spicy", spicy)
+        if seafood is not None:
+            result = result & self._value_bitset("seafood", seafood)
+        if meat:
+            result = result & self._value_bitset("meat", meat)
+        if cuisine:
+            result = result & self._value_bitset("cuisine", cuisine)
+        if green_level:
+            result = result & self._value_bitset("green_level", green_level)
+        if max_calories is not None:
+            end = np.searchsorted(self.sorted_calories, max_calories, side="right")
+            result = result & self._bitset(self.calorie_order[:end])
+        return result
+
+    def rows(self, bitset):
+        """Row numbers set in bitset, in file order."""
+        return np.flatnonzero(np.unpackbits(bitset, count=self.size))
+
+    def search(self, **filters):
+        return self.rows(self.mask(**filters))
@@ -0,0 +1,150 @@
+"""Offline batch recommendations over a JSONL file of prompts.
+
+    python batch.py prompts.jsonl -o results.jsonl --concurrency 8
+
+Every input line is {"id": ..., "prompt": ..., "model": optional model id or label}.
+Prompts go through the same tool-calling loop as the apps (FoodBot.aask).
+Results are appended to the output file as soon as they finish, which is
+also the checkpoint: rerunning the same command skips ids that already
+succeeded and retries the rest.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from foodbot_core import FoodBot
+from metrics import Trace
+from model_router import status_of
+from service import DEFAULT_MODEL, resolve_model
+
+
+def read_prompts(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            # A bad line becomes a failed result keyed by its line number, the rest of the file still runs
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                yield {"id": line_number, "invalid": f"line {line_number} is not valid JSON: {e}"}
+                continue
+            if not isinstance(item, dict):
+                yield {"id": line_number, "invalid": f"line {line_number} is not a JSON object"}
+                continue
+            item.setdefault("id", item.get("request_id", line_number))
+            yield item
+
+
+def read_checkpoint(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except ValueError:
+                continue  # Last line may be cut off if the previous run was killed
+            if result.get("status") == "ok":
+                done.add(str(result["id"]))
+    return done
+
+
+def is_retryable(error):
+    """Timeouts, rate limits and server errors may pass on a retry, bad requests and auth errors won't."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    status = status_of(error)
+    return status in (408, 429) or (status or 0) >= 500
+
+
+async def recommend(bot, item, retries, backoff):
+    model_info = resolve_model(item.get("model") or DEFAULT_MODEL)
+    if not model_info or not model_info.get("api_key"):
+        raise ValueError(f"model {item.get('model')} is not available")
+    prompt = item.get("prompt") or item.get("user_input") or ""
+
+    for attempt in range(retries + 1):
+        try:
+            return await bot.aask(model_info, [{"role": "user", "content": prompt}])
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            # Exponential backoff with jitter so retries don't arrive together
+            await asyncio.sleep(backoff * 2 ** attempt + random.uniform(0, backoff))
+
+
+async def run_batch(bot, input_path, output_path, concurrency=8, retries=3, backoff=1.0):
+    done = read_checkpoint(output_path)
+    queue = asyncio.Queue(maxsize=concurrency * 2)  # Read the input lazily, never all at once
+    stats = {"ok": 0, "failed": 0, "skipped": 0, "latencies": []}
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                start = time.perf_counter()
+                result = {"id": item["id"], "model": item.get("model") or DEFAULT_MODEL}
+                with Trace("batch", model=result["model"]) as trace:
+                    try:
+                        if "invalid" in item:
+                            raise ValueError(item["invalid"])
+                        result["answer"] = await recommend(bot, item, retries, backoff)
+                        result["status"] = "ok"
+                        stats["ok"] += 1
+                    except Exception as e:
+                        result["status"] = "error"
+                        result["error"] = trace.error = str(e)
+                        stats["failed"] += 1
+                result["latency"] = round(time.perf_counter() - start, 3)
+                stats["latencies"].append(result["latency"])
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+        start = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        for item in read_prompts(input_path):
+            if str(item["id"]) in done:
+                stats["skipped"] += 1
+                continue
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        stats["elapsed"] = time.perf_counter() - start
+    return stats
+
+
+def print_stats(stats):
+    latencies = sorted(stats["latencies"])
+    processed = stats["ok"] + stats["failed"]
+    print(f"processed {processed} (ok {stats['ok']}, failed {stats['failed']}, skipped {stats['skipped']}) "
+          f"in {stats['elapsed']:.1f}s, {processed / max(stats['elapsed'], 1e-9):.2f} req/s")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"latency p50 {statistics.median(latencies):.2f}s, p95 {p95:.2f}s, max {latencies[-1]:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run FoodBot recommendations over a JSONL file")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", default="results.jsonl")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="first retry delay in seconds")
+    args = parser.parse_args()
+
+    bot = FoodBot.load()
+    stats = asyncio.run(run_batch(bot, args.input, args.output, args.concurrency, args.retries, args.backoff))
+    print_stats(stats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Bulk encoding of menu descriptions.
+
+Texts are encoded in fixed size batches, optionally fanned out over a process
+pool where every worker loads its own copy of the model. Throughput is reported
+while it runs. Can also be run as a script to fill the embedding cache before
+the app starts:
+
+    python batch_encoder.py --menu menu.txt --batch-size 256 --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "256"))
+DEFAULT_WORKERS = int(os.getenv("EMBED_WORKERS", "0"))
+# Below this size a process pool costs more (model load per worker) than it saves
+MIN_ITEMS_FOR_POOL = 5000
+
+_worker_model = None
+
+
+def _init_worker(model_name):
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(1)  # One thread per process, the pool gives us the parallelism
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode_batch(texts):
+    return _worker_model.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+
+
+def print_progress(done, total, items_per_sec):
+    print(f"encoded {done}/{total} ({items_per_sec:.0f} items/s)", flush=True)
+
+
+def encode_texts(model, texts, batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+                 model_name=None, progress=print_progress):
+    """Encode texts into one normalized float32 matrix.
+
+    model is a loaded SentenceTransformer used in process. When workers > 1
+    and the input is large enough, batches are sent to a process pool that
+    loads model_name instead. progress(done, total, items_per_sec) is called
+    after every batch.
+    """
+    texts = list(texts)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    if not batches:
+        dim = model.get_sentence_embedding_dimension()
+        return np.zeros((0, dim), dtype=np.float32)
+
+    use_pool = workers > 1 and model_name and len(texts) >= MIN_ITEMS_FOR_POOL
+    start = time.perf_counter()
+    results = []
+    done = 0
+
+    def report(batch_result):
+        nonlocal done
+        results.append(batch_result)
+        done += len(batch_result)
+        if progress:
+            progress(done, len(texts), done / max(time.perf_counter() - start, 1e-9))
+
+    if use_pool:
+        # spawn, not fork: the parent already has torch loaded (and maybe its thread pools
+        # running), forking that state can deadlock. Workers load their own model anyway.
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_name,),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            # map keeps the input order, so rows line up with texts
+            for batch_result in pool.map(_encode_batch, batches):
+                report(batch_result)
+    else:
+        for batch in batches:
+            report(model.encode(batch, batch_size=batch_size, normalize_embeddings=True))
+
+    return np.ascontiguousarray(np.concatenate(results), dtype=np.float32)
+
+
+def main():
+    from sentence_transformers import SentenceTransformer
+
+    from embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description="Encode menu.txt into the embedding cache")
+    parser.add_argument("--menu", default="menu.txt")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    descs = []
+    with open(args.menu, "r", encoding="utf-8") as f:
+        for line in f:
+            if ":" not in line:
+                continue
+            desc = line.split(":", 1)[1].split("|", 1)[0].strip()
+            if desc:
+                descs.append(desc)
+
+    store = EmbeddingStore(args.model)
+    missing = store.missing(descs)
+    print(f"{len(descs)} descriptions, {len(missing)} not cached yet")
+    if missing:
+        model = SentenceTransformer(args.model)
+        store.add(missing, encode_texts(model, missing, args.batch_size, args.workers, args.model))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+"""Reproducible benchmarks on synthetic catalogs.
+
+    python bench.py --sizes 100,10000,100000,1000000 -o bench.json
+    python bench.py --sizes 100,10000 --compare bench.json
+
+For every size a synthetic menu.txt and foodlist.json are generated and a
+fresh subprocess (so peak RSS is per size) measures:
+
+- startup: import, catalog load, cold build (encode + index) and warm start from the disk cache
+- rag_random_menu latency
+- search_menu filter latency for several filter combinations
+- end-to-end ask() latency against the local deterministic mock LLM (mock_llm.py)
+- size, top-k recall and search latency of float16 / int8 embeddings against float32 (quantized.py)
+- peak RSS
+
+Embeddings come from a deterministic hashing embedder by default, so runs
+are comparable and need no model download; --embedder model uses the real
+SentenceTransformer. Results are written as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+import numpy as np
+
+WORDS = [
+    "ข้าว", "ผัด", "ต้ม", "แกง", "ยำ", "ทอด", "ย่าง", "นึ่ง", "หมู", "ไก่", "กุ้ง", "เนื้อ", "ปลา",
+    "ผัก", "เผ็ด", "หวาน", "เปรี้ยว", "เค็ม", "กรอบ", "นุ่ม", "หอม", "เส้น", "ซุป", "ไข่",
+    "noodle", "rice", "soup", "curry", "salad", "grill", "spicy", "sweet", "crispy", "creamy",
+]
+MEATS = ["pork", "chicken", "beef", "shrimp", "fish", "duck", "seafood", ""]
+CUISINES = ["thai", "chinese", "japanese", "korean", "italian", "american", "mexican", "indian"]
+GREEN_LEVELS = ["none", "low", "medium", "high"]
+QUERIES = [
+    "อยากกินอะไรดี", "อยากกินอะไรแซ่บๆ", "ของกินคลีนๆ", "หมูไม่เผ็ด", "ซุปร้อนๆ",
+    "spicy noodle soup", "crispy chicken", "ข้าวผัดกุ้ง", "แกงเขียวหวาน", "salad",
+]
+FILTER_COMBOS = {
+    "none": {},
+    "spicy": {"spicy": True},
+    "meat": {"meat": "pork"},
+    "max_calories": {"max_calories": 400},
+    "spicy+meat": {"spicy": False, "meat": "chicken"},
+    "cuisine+green_level+max_calories": {"cuisine": "thai", "green_level": "low", "max_calories": 600},
+    "all": {"spicy": True, "seafood": False, "meat": "beef", "cuisine": "thai",
+            "green_level": "none", "max_calories": 800},
+}
+
+
+class HashEmbedder:
+    """Deterministic stand-in for SentenceTransformer: a hashed, signed bag of words."""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.split():
+                h = zlib.crc32(word.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x10000 else -1.0
+        if normalize_embeddings:
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors[0] if single else vectors
+
+
+def make_catalog(size, directory, seed=0):
+    """Write a synthetic menu.txt and foodlist.json with size dishes."""
+    rng = random.Random(seed)
+    menu_path = os.path.join(directory, "menu.txt")
+    food_path = os.path.join(directory, "foodlist.json")
+
+    with open(menu_path, "w", encoding="utf-8") as f:
+        for i in range(size):
+            desc = " ".join(rng.choices(WORDS, k=12))
+            f.write(f"เมนู {i}: {desc}|https://example.com/img/{i}.jpg\n")
+
+    items = [
+        {
+            "name": f"เมนู {i}",
+            "eng_name": f"Dish {i}",
+            "rice": rng.choice(["possible", "contain", "not-contain"]),
+            "meat": [rng.choice(MEATS)],
+            "spicy": rng.random() < 0.35,
+            "seafood": rng.random() < 0.25,
+            "green_level": rng.choice(GREEN_LEVELS),
+            "contain_nut": "none",
+            "contain_milk": "none",
+            "avg_calories": rng.randint(80, 1200),
+            "cuisine": rng.choice(CUISINES),
+        }
+        for i in range(size)
+    ]
+    with open(food_path, "w", encoding="utf-8") as f:
+        json.dump(items, f, ensure_ascii=False)
+    return menu_path, food_path
+
+
+def summarize(samples):
+    """p50/p99/mean of samples in seconds, reported in milliseconds."""
+    ms = np.asarray(samples) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "mean_ms": round(float(ms.mean()), 4),
+        "n": len(samples),
+    }
+
+
+def measure_quantization(matrix, queries, k, rounds):
+    """Memory, recall@k and exact search latency of each EMBED_PRECISION on the same vectors.
+
+    A hit counts when its float32 score reaches the k-th best float32 score,
+    so ties at the cut-off are not counted as misses.
+    """
+    from ann_index import ExactIndex
+    from quantized import QuantizedMatrix
+
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    k = min(k, matrix.shape[0])
+    kth_scores = [np.sort(matrix @ q)[-k] for q in queries]
+    report = {}
+    for precision in ("float32", "float16", "int8"):
+        compact = matrix if precision == "float32" else QuantizedMatrix.quantize(matrix, precision)
+        index = ExactIndex(compact)
+        hits = [np.count_nonzero(matrix[index.search(q, k)[0]] @ q >= kth - 1e-6) for q, kth in zip(queries, kth_scores)]
+        report[precision] = {
+            "matrix_mb": round(compact.nbytes / 2 ** 20, 2),
+            f"recall_at_{k}": round(float(np.mean(hits)) / k, 4),
+            "search": summarize([timed(index.search, queries[i % len(queries)], k) for i in range(rounds)]),
+        }
+    return report
+
+
+def start_mock_llm():
+    """Serve mock_llm on a free local port from a background thread, return its base URL."""
+    from aiohttp import web
+
+    import mock_llm
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(mock_llm.create_app())
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    host, port = runner.addresses[0][:2]
+    return f"http://{host}:{port}/v1"
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def run_size(size, args):
+    """Benchmark one catalog size in this process and return its results."""
+    workdir = tempfile.mkdtemp(prefix="foodbot-bench-")
+    os.environ["FOODBOT_CACHE_DIR"] = os.path.join(workdir, "cache")
+    os.environ["TRACE_LOG"] = "0"
+    try:
+        start = time.perf_counter()
+        import foodbot_core
+        from metrics import Trace
+        result = {"size": size, "import_s": round(time.perf_counter() - start, 4)}
+
+        menu_path, food_path = make_catalog(size, workdir, args.seed)
+        start = time.perf_counter()
+        menu_knowledge = foodbot_core.load_menu_from_txt(menu_path)
+        food_index = foodbot_core.load_food_index(food_path)
+        result["load_catalog_s"] = round(time.perf_counter() - start, 4)
+
+        embedder = foodbot_core.load_rag_model() if args.embedder == "model" else HashEmbedder(args.dim)
+        with Trace("bench_cold_start") as trace:
+            bot = foodbot_core.FoodBot(embedder, menu_knowledge, food_index)
+        stages = dict(trace.stages)
+        result["cold_start_s"] = round(trace.seconds, 4)
+        result["embedding_build_s"] = round(stages["build_embeddings"], 4)
+        result["index_build_s"] = round(stages["build_index"], 4)
+        result["index_kind"] = bot.menu_index.kind
+
+        # Second start maps the cached embeddings and loads the saved index
+        with Trace("bench_warm_start") as trace:
+            bot = foodbot_core.FoodBot(embedder, menu_knowledge, food_index)
+        result["warm_start_s"] = round(trace.seconds, 4)
+
+        rng = random.Random(args.seed)
+        queries = [rng.choice(QUERIES) for _ in range(args.queries)]
+        result["rag_random_menu"] = summarize([timed(bot.rag_random_menu, q) for q in queries])
+
+        # Queries: the prompt set plus catalog rows, the near-duplicate case is the hardest for quantization
+        sample_rows = rng.sample(range(len(bot.menu_names)), min(100, len(bot.menu_names)))
+        query_vectors = [embedder.encode(q, normalize_embeddings=True) for q in QUERIES]
+        query_vectors += list(np.asarray(bot.menu_matrix[np.sort(sample_rows)], dtype=np.float32))
+        result["quantization"] = measure_quantization(bot.menu_matrix, query_vectors, 16, args.queries)
+
+        result["search_menu"] = {}
+        for name, filters in FILTER_COMBOS.items():
+            samples = [timed(bot.food_index.search, **filters) for _ in range(args.queries)]
+            result["search_menu"][name] = {**summarize(samples), "matches": int(bot.food_index.search(**filters).size)}
+
+        if not args.no_llm:
+            model_info = {"id": "openai/mock", "api_key": "mock", "api_base": start_mock_llm()}
+            samples = [
+                timed(bot.ask, model_info, [{"role": "user", "content": q}])
+                for q in queries[:args.llm_requests]
+            ]
+            result["end_to_end"] = summarize(samples)
+
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["peak_rss_mb"] = round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def compare(old, new):
+    """Print p50/p99 changes between two result files."""
+    old_by_size = {r["size"]: r for r in old["results"]}
+    for result in new["results"]:
+        before = old_by_size.get(result["size"])
+        if not before:
+            continue
+        pairs = [("rag_random_menu", result.get("rag_random_menu"), before.get("rag_random_menu")),
+                 ("end_to_end", result.get("end_to_end"), before.get("end_to_end"))]
+        pairs += [(f"search_menu[{name}]", stats, before.get("search_menu", {}).get(name))
+                  for name, stats in result.get("search_menu", {}).items()]
+        pairs += [(f"quantization[{name}]", stats.get("search"), before.get("quantization", {}).get(name, {}).get("search"))
+                  for name, stats in result.get("quantization", {}).items()]
+        for name, now, then in pairs:
+            if not now or not then:
+                continue
+            for key in ("p50_ms", "p99_ms"):
+                change = (now[key] - then[key]) / max(then[key], 1e-9) * 100
+                print(f"size {result['size']:>8} {name:<45} {key} {then[key]:>10.3f} -> {now[key]:>10.3f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FoodBot on synthetic catalogs")
+    parser.add_argument("--sizes", default="100,10000,100000,1000000")
+    parser.add_argument("--queries", type=int, default=200, help="timed queries per measurement")
+    parser.add_argument("--llm-requests", type=int, default=20)
+    parser.add_argument("--no-llm", action="store_true", help="skip the end-to-end mock LLM run")
+    parser.add_argument("--embedder", choices=["hash", "model"], default="hash")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)  # Child process mode
+    args = parser.parse_args()
+
+    if args.size is not None:
+        print(json.dumps(run_size(args.size, args)))
+        return
+
+    results = []
+    for size in [int(s) for s in args.sizes.split(",")]:
+        child_args = ["--queries", str(args.queries), "--llm-requests", str(args.llm_requests),
+                      "--embedder", args.embedder, "--dim", str(args.dim), "--seed", str(args.seed)]
+        if args.no_llm:
+            child_args.append("--no-llm")
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *child_args, "--size", str(size)],
+            capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            print(completed.stderr, file=sys.stderr)
+            raise SystemExit(f"benchmark for size {size} failed")
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        print(f"size {size}: done", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "embedder": args.embedder,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
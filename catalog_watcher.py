@@ -0,0 +1,106 @@
+"""Hot reload of menu.txt and foodlist.json without restarting.
+
+A background thread polls the modification time and size of both files.
+When either changes, the catalog is loaded again and a new FoodBot is built
+next to the running one. Embeddings are content-addressed (embedding_store.py),
+so only added or edited descriptions go through the encoder. The new bot
+replaces the old one with a single attribute assignment: a request that
+already holds the old bot finishes on it, the next one gets the new bot,
+and nobody sees a half-built catalog. After the swap, the old catalog's
+vectors, indexes and quantized copies are removed from the cache.
+"""
+import os
+import threading
+import time
+
+from metrics import metrics, span
+
+CATALOG_POLL_SECONDS = float(os.getenv("CATALOG_POLL_SECONDS", "2"))
+
+
+def diff_catalog(old_bot, menu_knowledge, food_data):
+    """Count added, removed and changed entries between a bot and a new catalog."""
+    old_food = {item["name"]: item for item in old_bot.food_data}
+    new_food = {item["name"]: item for item in food_data}
+    old_menu = old_bot.menu_knowledge
+
+    def count(old, new):
+        return {
+            "added": len(new.keys() - old.keys()),
+            "removed": len(old.keys() - new.keys()),
+            "changed": sum(1 for name in new.keys() & old.keys() if new[name] != old[name]),
+        }
+
+    return {"menu": count(old_menu, menu_knowledge), "food": count(old_food, new_food)}
+
+
+class CatalogWatcher:
+    """Keep .bot in sync with the catalog files, on_reload(bot) is called after every swap."""
+
+    def __init__(self, bot, menu_path="menu.txt", food_path="foodlist.json",
+                 interval=CATALOG_POLL_SECONDS, on_reload=None):
+        self.bot = bot
+        self.menu_path = menu_path
+        self.food_path = food_path
+        self.interval = interval
+        self.on_reload = on_reload
+        self.last_diff = None
+        self._stamps = self._file_stamps()
+        self._stopped = threading.Event()
+        if interval > 0:
+            threading.Thread(target=self._poll, name="foodbot-catalog-watcher", daemon=True).start()
+
+    def _file_stamps(self):
+        stamps = []
+        for path in (self.menu_path, self.food_path):
+            try:
+                stat = os.stat(path)
+                stamps.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append(None)  # Missing for a moment while an editor saves
+        return stamps
+
+    def _poll(self):
+        while not self._stopped.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stopped.set()
+
+    def check(self):
+        """Reload if a catalog file changed since the last check, return True on a swap."""
+        stamps = self._file_stamps()
+        if stamps == self._stamps or None in stamps:
+            return False
+        self._stamps = stamps
+        try:
+            self.reload()
+        except Exception as e:
+            # Keep serving the old catalog, the next save triggers another try
+            metrics.inc("foodbot_catalog_reload_errors_total")
+            print(f"Catalog reload failed, keeping the old catalog: {e}")
+            return False
+        return True
+
+    def reload(self):
+        # Imported here so this module stays importable from foodbot_core
+        from foodbot_core import load_food_index, load_menu_from_txt
+
+        start = time.perf_counter()
+        with span("catalog_reload"):
+            menu_knowledge = load_menu_from_txt(self.menu_path)
+            food_index = load_food_index(self.food_path)
+            self.last_diff = diff_catalog(self.bot, menu_knowledge, food_index.items)
+            bot = self.bot.with_catalog(menu_knowledge, food_index)
+        self.bot = bot  # Atomic swap
+        metrics.inc("foodbot_catalog_reloads_total")
+        print(f"Catalog reloaded in {time.perf_counter() - start:.2f}s: {self.last_diff}")
+        if self.on_reload:
+            self.on_reload(bot)
+        try:
+            # Files of the old catalog are dead weight now, the next restart maps contiguous rows again
+            removed = bot.prune_cache()
+            print(f"Pruned {removed} cache files of older catalogs")
+        except Exception as e:
+            print(f"Could not prune the embedding cache: {e}")
+        return bot
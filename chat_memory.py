@@ -0,0 +1,128 @@
+"""Per-session chat history that stays inside a token budget.
+
+Every turn keeps its messages (user, tool calls, tool results, answer). When
+a new question comes in, the prompt is built from:
+
+- a short system summary of older turns and of the latest search_menu constraints,
+- the last few turns as plain question / answer pairs,
+- the full messages of the previous turn (so "อันที่สอง" still works),
+- the new question.
+
+Older turns are folded into the summary until the estimate fits
+CHAT_TOKEN_BUDGET, so the prompt stays the same size however long the chat
+gets. A follow-up that only narrows the latest search ("ขอแบบไม่เผ็ด")
+reuses its constraints, see follow_up_search().
+"""
+import json
+import os
+
+from foodbot_core import estimate_tokens
+
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "1500"))
+CHAT_KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", "3"))
+SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+FILTER_KEYS = ("spicy", "seafood", "meat", "cuisine", "green_level", "max_calories")
+
+
+def _get(message, key):
+    return message.get(key) if isinstance(message, dict) else getattr(message, key, None)
+
+
+def _search_args(messages):
+    """Arguments of the last search_menu call in messages, or None."""
+    args = None
+    for message in messages:
+        for tool_call in _get(message, "tool_calls") or []:
+            function = _get(tool_call, "function")
+            if _get(function, "name") == "search_menu":
+                try:
+                    args = json.loads(_get(function, "arguments") or "{}")
+                except ValueError:
+                    continue
+    return args
+
+
+def _message_tokens(message):
+    tool_calls = _get(message, "tool_calls")
+    text = str(_get(message, "content") or "")
+    if tool_calls:
+        text += json.dumps([_get(_get(call, "function"), "arguments") for call in tool_calls], ensure_ascii=False)
+    return estimate_tokens(text)
+
+
+def narrows(old, new):
+    """True when every filter of old is still in new, unchanged or (max_calories) lower."""
+    for key in FILTER_KEYS:
+        if old.get(key) is None:
+            continue
+        if key == "max_calories":
+            if new.get(key) is None or new[key] > old[key]:
+                return False
+        elif new.get(key) != old[key]:
+            return False
+    return True
+
+
+class ChatMemory:
+    def __init__(self, budget=CHAT_TOKEN_BUDGET, keep_turns=CHAT_KEEP_TURNS):
+        self.budget = budget
+        self.keep_turns = keep_turns
+        self.summary = []  # One short line per folded turn
+        self.turns = []  # {"user": text, "answer": text, "messages": [...]}
+        self.last_search = None  # Arguments of the latest search_menu call
+
+    def history(self):
+        """(question, answer) of every turn still in memory, oldest first."""
+        return [(turn["user"], turn["answer"]) for turn in self.turns]
+
+    def _summary_message(self):
+        lines = list(self.summary)
+        if self.last_search:
+            lines.append("เงื่อนไขค้นหาล่าสุด: " + json.dumps(self.last_search, ensure_ascii=False))
+        if not lines:
+            return []
+        return [{"role": "system", "content": "สรุปบทสนทนาก่อนหน้า:\n" + "\n".join(lines)}]
+
+    def _render(self, user_text):
+        messages = self._summary_message()
+        for turn in self.turns[:-1]:
+            messages += [{"role": "user", "content": turn["user"]}, {"role": "assistant", "content": turn["answer"]}]
+        if self.turns:
+            messages += self.turns[-1]["messages"]
+        return messages + [{"role": "user", "content": user_text}]
+
+    def messages(self, user_text):
+        """Prompt for the next question, folded until it fits the budget."""
+        while True:
+            messages = self._render(user_text)
+            fits = sum(_message_tokens(m) for m in messages) <= self.budget
+            if (fits and len(self.turns) <= self.keep_turns) or not self.turns:
+                return messages
+            self._fold_oldest()
+
+    def _fold_oldest(self):
+        turn = self.turns.pop(0)
+        self.summary.append(f"- ผู้ใช้: {turn['user'][:60]} → แนะนำ: {turn['answer'][:80]}")
+        while len(self.summary) > 1 and estimate_tokens("\n".join(self.summary)) > SUMMARY_TOKEN_BUDGET:
+            self.summary.pop(0)
+
+    def add_turn(self, messages):
+        """Store one finished turn: messages from the user question to the final answer."""
+        answer = _get(messages[-1], "content") or ""
+        self.turns.append({"user": _get(messages[0], "content"), "answer": answer, "messages": list(messages)})
+        args = _search_args(messages)
+        if args is not None:
+            self.last_search = args
+
+    def follow_up_search(self, parsed_args):
+        """search_menu arguments for a follow-up that only narrows the latest search, else None.
+
+        parsed_args are the arguments the intent parser found in the follow-up.
+        """
+        if not parsed_args or not self.last_search:
+            return None
+        merged = {key: value for key, value in self.last_search.items() if key in FILTER_KEYS or key == "query"}
+        merged.update(parsed_args)
+        if not narrows(self.last_search, merged):
+            return None
+        return merged
@@ -0,0 +1,163 @@
+"""On-disk embedding cache for menu descriptions.
+
+Every vector is keyed by the model name plus a sha256 of the description it
+was encoded from. Vectors are appended to one raw float32 file per model and
+opened with np.memmap, so a restart or another worker process maps the file
+instead of running the encoder again. Only new or changed descriptions go
+through the encoder.
+
+Edited descriptions leave their old vectors behind. compact() rewrites the
+store with only the live ones, in catalog order, into a new vectors file that
+meta.json then points to.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+try:
+    import fcntl  # Lock between worker processes (not available on Windows)
+except ImportError:
+    fcntl = None
+
+CACHE_DIR = os.getenv("FOODBOT_CACHE_DIR", ".cache")
+COPY_CHUNK_ROWS = 65536  # Rows copied at a time by compact()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Memory-mapped store of normalized embeddings for one model, append-only between compactions."""
+
+    def __init__(self, model_name: str, cache_dir: str = None):
+        slug = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name)
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir or CACHE_DIR, "embeddings", slug)
+        self.meta_path = os.path.join(self.path, "meta.json")
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _load(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            meta = {"model": self.model_name, "dim": None, "keys": []}
+
+        # compact() writes a new vectors file, meta.json names the live one
+        self.vectors_path = os.path.join(self.path, meta.get("file", "vectors.f32"))
+        self.dim = meta["dim"]
+        self.keys = meta["keys"]
+        self.rows = {key: i for i, key in enumerate(self.keys)}
+
+        # meta.json is written after the vectors, so the file may hold extra rows
+        # from an interrupted write. Only map the rows that meta knows about.
+        if self.keys:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(len(self.keys), self.dim))
+        else:
+            self.vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+
+    def missing(self, texts):
+        """Return the unique texts that have no vector in the store yet."""
+        seen = set()
+        result = []
+        for text in texts:
+            key = text_key(text)
+            if key not in self.rows and key not in seen:
+                seen.add(key)
+                result.append(text)
+        return result
+
+    def _locked(self):
+        lock_file = open(os.path.join(self.path, ".lock"), "w")
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _write_meta(self, keys, dim, vectors_path):
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": int(dim), "keys": keys,
+                       "file": os.path.basename(vectors_path)}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def add(self, texts, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, self._locked():
+            self._load()  # Another process may have appended while we were encoding
+
+            new_rows = [(text_key(t), vec) for t, vec in zip(texts, vectors) if text_key(t) not in self.rows]
+            if not new_rows:
+                return
+            keys = self.keys + [key for key, _ in new_rows]
+
+            with open(self.vectors_path, "r+b" if os.path.exists(self.vectors_path) else "wb") as f:
+                f.seek(len(self.keys) * vectors.shape[1] * 4)
+                f.truncate()
+                f.write(np.stack([vec for _, vec in new_rows]).tobytes())
+
+            self._write_meta(keys, vectors.shape[1], self.vectors_path)
+            self._load()
+
+    def compact(self, texts):
+        """Keep only the vectors of texts, stored in that order. Returns the number of rows dropped.
+
+        After a catalog edit the old vectors are dead weight, and the catalog's
+        rows are no longer one block, so get() has to copy instead of returning
+        a view. The live rows go to a new file and meta.json is switched to it,
+        so a crash leaves either the old or the new store. Arrays already mapped
+        from the old file keep working, the file is only unlinked.
+        """
+        with self._lock, self._locked():
+            self._load()
+            keys = [key for key in dict.fromkeys(text_key(t) for t in texts) if key in self.rows]
+            if keys == self.keys:
+                return 0
+
+            vectors_path = os.path.join(self.path, f"vectors-{time.time_ns()}.f32")
+            rows = np.fromiter((self.rows[key] for key in keys), dtype=np.int64, count=len(keys))
+            with open(vectors_path, "wb") as f:
+                for start in range(0, rows.size, COPY_CHUNK_ROWS):
+                    f.write(np.ascontiguousarray(self.vectors[rows[start:start + COPY_CHUNK_ROWS]]).tobytes())
+            dropped = len(self.keys) - len(keys)
+            self._write_meta(keys, self.dim, vectors_path)
+            self._load()
+
+            # Also clears files left by a compaction that died before switching meta.json
+            for entry in os.scandir(self.path):
+                if entry.name.startswith("vectors") and entry.name.endswith(".f32") and entry.path != self.vectors_path:
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass  # Still mapped on Windows, the next compaction retries
+            return dropped
+
+    def get(self, texts, encode):
+        """Return the embedding matrix for texts, encoding only the missing ones.
+
+        encode(list_of_texts) must return normalized vectors. When the texts
+        are stored in the same order (the usual case for a catalog) the result
+        is a zero-copy view on the memory-mapped file.
+        """
+        missing = self.missing(texts)
+        if missing:
+            self.add(missing, encode(missing))
+
+        rows = np.fromiter((self.rows[text_key(t)] for t in texts), dtype=np.int64, count=len(texts))
+        if not rows.size:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        start = rows[0]
+        if np.array_equal(rows, np.arange(start, start + rows.size)):
+            return self.vectors[start:start + rows.size]
+        return np.ascontiguousarray(self.vectors[rows])
@@ -0,0 +1,711 @@
+"""Recommendation core shared by the Streamlit apps, the HTTP service and batch jobs.
+
+Holds the RAG random picker, search_menu and the LLM tool-calling loop.
+Nothing in here depends on Streamlit, callers decide how to cache and render.
+litellm and sentence_transformers (torch) are imported on first use, so
+importing this module stays cheap.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from dotenv import load_dotenv
+
+from ann_index import load_or_build_index, top_k_indices
+from attribute_index import AttributeIndex
+from batch_encoder import encode_texts
+from catalog_watcher import CatalogWatcher
+from embedding_store import EmbeddingStore, text_key
+from intent import IntentParser
+from metrics import current_trace, metrics, span
+from model_router import AUTO_MODEL_ID, router
+from quantized import load_or_quantize
+from single_flight import SINGLE_FLIGHT, request_key, single_flight
+
+# Load API Key
+try:
+    load_dotenv()
+    GROQ_KEY = os.getenv("GROQ_API_KEY")
+    OPENAI_KEY = os.getenv("OPENAI_API_KEY")
+
+    # Setting keys by environment
+    os.environ["GROQ_API_KEY"] = GROQ_KEY
+    os.environ["OPENAI_API_KEY"] = OPENAI_KEY
+except Exception as e:
+    print(f"Could not load .env file: {e}")
+    GROQ_KEY = None
+    OPENAI_KEY = None
+
+
+# Model list
+MODELS = {
+    "🧠 OpenAI GPT (gpt-4o-mini)": {
+        "id": "gpt-4o-mini",
+        "api_key": OPENAI_KEY,
+    },
+    "🦙 LLaMA 3.1 8B Instant": {
+        "id": "groq/llama-3.1-8b-instant",
+        "api_key": GROQ_KEY,
+    },
+    "🦙 LLaMA 3.3 70B Versatile": {
+        "id": "groq/llama-3.3-70b-versatile",
+        "api_key": GROQ_KEY,
+    },
+    # Picks the fastest healthy model above on every call, see model_router.py
+    "🚦 Auto (เลือกโมเดลที่เร็วที่สุดให้)": {
+        "id": AUTO_MODEL_ID,
+        "api_key": OPENAI_KEY or GROQ_KEY,
+    },
+}
+
+RAG_MODEL_NAME = "all-MiniLM-L6-v2"
+MAX_TOOL_ROUNDS = int(os.getenv("MAX_TOOL_ROUNDS", "3"))
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "4"))
+HYBRID_TOP_K = int(os.getenv("HYBRID_TOP_K", "10"))
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", "10"))
+MAX_SEARCH_PAGE_SIZE = 50
+TOOL_RESULT_TOKEN_BUDGET = int(os.getenv("TOOL_RESULT_TOKEN_BUDGET", "600"))
+# "off": always ask the LLM, "assist": simple requests skip the tool-calling round,
+# "fast": simple requests are answered from search_menu without any LLM call
+INTENT_MODE = os.getenv("INTENT_MODE", "assist")
+NO_MATCH_MESSAGE = "ไม่พบเมนูที่ตรงกับความต้องการของคุณเลย ลองเปลี่ยนเงื่อนไขดูนะ"
+
+
+def load_rag_model():
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(RAG_MODEL_NAME)
+
+
+# Loading menu from file menu.txt
+def load_menu_from_txt(file_path="menu.txt"):
+    menu_knowledge = {}
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            cleaned_line = line.strip()
+            if not cleaned_line or ":" not in cleaned_line:
+                continue  # Skip any empty or non-existent lines.
+
+            # Split menu name form other parts.
+            name_part, rest_part = cleaned_line.split(":", 1)
+            name = name_part.strip()
+
+            # Check if it has image URL.
+            if "|" in rest_part:
+                desc_part, img_part = rest_part.split("|", 1)
+                desc = desc_part.strip()
+                img_url = img_part.strip()
+            else:
+                # If dosn't have | just leave a description.
+                desc = rest_part.strip()
+                img_url = None
+
+            # Store data
+            if name:
+                menu_knowledge[name] = {
+                    "desc": desc,
+                    "img": img_url
+                }
+    return menu_knowledge
+
+
+# Load menu data from JSON file, then compile it into attribute bitsets once
+def load_food_index(file_path="foodlist.json"):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return AttributeIndex(json.load(f))
+
+
+def normalize_name(name):
+    # Drop emoji, spaces and punctuation so "ผัดไทย 🥜" in menu.txt matches "ผัดไทย" in foodlist.json
+    return "".join(c for c in name if not unicodedata.category(c).startswith(("S", "Z", "P", "C"))).lower()
+
+
+# Join both catalogs: one searchable text and image per foodlist.json item,
+# using the menu.txt description and image of the same dish when there is one
+def join_catalog(menu_knowledge, food_data):
+    menu_by_name = {normalize_name(name): data for name, data in menu_knowledge.items()}
+    texts, imgs = [], []
+    for item in food_data:
+        data = menu_by_name.get(normalize_name(item["name"]), {})
+        parts = [item["name"], item.get("eng_name"), data.get("desc"), item.get("cuisine")]
+        parts += [meat for meat in item.get("meat", []) if meat]
+        if item.get("spicy"):
+            parts.append("เผ็ด spicy")
+        if item.get("seafood"):
+            parts.append("อาหารทะเล seafood")
+        texts.append(" ".join(part for part in parts if part))
+        imgs.append(data.get("img"))
+    return texts, imgs
+
+
+# Rough token count without a tokenizer: about 3 UTF-8 bytes per token errs on the safe side for Thai
+def estimate_tokens(text):
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+# Shrink a tool result until its JSON fits in budget tokens.
+# Paged results drop items from the end and point next_offset at the first dropped one.
+def fit_to_budget(result, budget=TOOL_RESULT_TOKEN_BUDGET):
+    content = json.dumps(result, ensure_ascii=False)
+    if estimate_tokens(content) <= budget:
+        return content
+
+    if isinstance(result, dict) and isinstance(result.get("items"), list):
+        result = dict(result, truncated=True)
+        items = list(result["items"])
+        while items:
+            items.pop()
+            result["items"] = items
+            result["next_offset"] = result.get("offset", 0) + len(items)
+            content = json.dumps(result, ensure_ascii=False)
+            if estimate_tokens(content) <= budget:
+                return content
+    return content[:budget * 3]
+
+
+# Define the function schema for AI to recognize (Tool Definition)
+tools = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_menu",
+            "description": "ค้นหาเมนูอาหารจากฐานข้อมูลตามเงื่อนไขที่ผู้ใช้ระบุ เช่น รสชาติ, ประเภทเนื้อสัตว์, แคลอรี่ หรือประเภทอาหาร "
+                           "ผลลัพธ์คืนทีละหน้า แต่ละเมนูอยู่ในรูป ชื่อ|แคลอรี่ ถ้า next_offset ไม่เป็น null ขอหน้าถัดไปได้ด้วย offset=next_offset",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "สิ่งที่ผู้ใช้อยากกินเป็นคำพูด ใช้จัดอันดับเมนูที่ใกล้เคียงที่สุดขึ้นก่อน"},
+                    "spicy": {"type": "boolean", "description": "ต้องการอาหารรสเผ็ดหรือไม่"},
+                    "seafood": {"type": "boolean", "description": "ต้องการอาหารทะเลหรือไม่"},
+                    "meat": {"type": "string", "description": "ประเภทเนื้อสัตว์ที่ต้องการ เช่น pork, chicken, shrimp"},
+                    "cuisine": {"type": "string", "description": "ประเภทอาหาร เช่น thai, japanese, healthy"},
+                    "green_level": {"type": "string", "enum": ["vegetarian", "vegan"], "description": "สำหรับคนทานมังสวิรัติหรือวีแกน"},
+                    "max_calories": {"type": "number", "description": "ปริมาณแคลอรี่สูงสุดที่ไม่ต้องการให้เกิน"},
+                    "sort": {"type": "string", "enum": ["relevance", "calories", "calories_desc"], "description": "เรียงตามความใกล้เคียงกับ query หรือตามแคลอรี่"},
+                    "limit": {"type": "integer", "description": f"จำนวนเมนูต่อหน้า (ไม่เกิน {MAX_SEARCH_PAGE_SIZE})"},
+                    "offset": {"type": "integer", "description": "ใช้ next_offset จากผลลัพธ์ก่อนหน้าเพื่อขอหน้าถัดไป"}
+                },
+                "required": [], # Make every parameter to optional
+            },
+        }
+    }
+]
+
+
+def completion_args(model_info):
+    args = {"model": model_info["id"], "api_key": model_info.get("api_key")}
+    if model_info.get("api_base"):
+        args["api_base"] = model_info["api_base"]
+    return args
+
+
+# Models the "auto" model routes between: its own list, or every other model with a key
+def auto_candidates(model_info):
+    if model_info.get("candidates"):
+        return model_info["candidates"]
+    return [info for info in MODELS.values() if info["id"] != AUTO_MODEL_ID and info.get("api_key")]
+
+
+# Stream a completion token by token, then rebuild the full response
+# (stream_chunk_builder also puts streamed tool calls and usage back together).
+# claim() is asked on the first chunk when racing other models, False means stop reading.
+def stream_completion(on_delta=None, claim=None, **kwargs):
+    from litellm import completion, stream_chunk_builder
+
+    chunks = []
+    text = ""
+    for chunk in completion(stream=True, **kwargs):
+        if claim is not None and not chunks and not claim():
+            return None  # Another model answered first
+        chunks.append(chunk)
+        delta = chunk.choices[0].delta.content if chunk.choices else None
+        if delta:
+            text += delta
+            if on_delta:
+                on_delta(text)
+    return stream_chunk_builder(chunks, messages=kwargs.get("messages"))
+
+
+# One streamed completion, hedged across models when model_info is "auto".
+# Identical requests in flight at the same time share one upstream call (see single_flight.py).
+# With single flight the upstream call runs on its own thread and every caller, leader included,
+# renders the shared text with its own on_delta, so one session's UI never runs inside another's call.
+def complete(model_info, on_delta=None, **kwargs):
+    def run(emit):
+        if model_info["id"] != AUTO_MODEL_ID:
+            return stream_completion(emit, **kwargs, **completion_args(model_info))
+
+        def call(candidate, claim, candidate_emit):
+            return stream_completion(candidate_emit, claim, timeout=router.timeout, **kwargs, **completion_args(candidate))
+
+        return router.run(auto_candidates(model_info), call, emit)[1]
+
+    if not SINGLE_FLIGHT:
+        response, shared = run(on_delta), False
+    else:
+        key = request_key(model_info["id"], kwargs["messages"], kwargs.get("tools"), kwargs.get("tool_choice"))
+        response, shared = single_flight.do(key, run, on_delta)
+    if not shared:
+        record_response(response)  # Tokens are only counted for the call that spent them
+    return response
+
+
+# Async completion, limiter is an async context manager or a function of the model id returning one
+async def acomplete(model_info, limiter=None, **kwargs):
+    from litellm import acompletion
+
+    async def call(candidate):
+        limit = limiter(candidate["id"]) if callable(limiter) else limiter
+        args = {**kwargs, **completion_args(candidate)}
+        if limit is None:
+            return await acompletion(**args)
+        async with limit:
+            return await acompletion(**args)
+
+    async def run():
+        if model_info["id"] != AUTO_MODEL_ID:
+            return await call(model_info)
+        return (await router.arun(auto_candidates(model_info), call))[1]
+
+    if not SINGLE_FLIGHT:
+        response, shared = await run(), False
+    else:
+        key = request_key(model_info["id"], kwargs["messages"], kwargs.get("tools"), kwargs.get("tool_choice"))
+        response, shared = await single_flight.ado(key, run)
+    if not shared:
+        record_response(response)
+    return response
+
+
+# Token usage and tool calls of one completion go to the current trace, if any
+def record_response(response):
+    trace = current_trace()
+    if trace is not None:
+        trace.add_usage(getattr(response, "usage", None))
+        trace.add_tool_calls(len(response.choices[0].message.tool_calls or []))
+
+
+# Run fn on a pool thread with the caller's context, so spans still reach the current trace
+def in_context(fn, *args, **kwargs):
+    return functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+# Template answer for the fast intent path, no LLM involved
+def format_search_answer(result):
+    if not result["items"]:
+        return result.get("message", NO_MATCH_MESSAGE)
+    lines = []
+    for item in result["items"][:5]:
+        name, calories = item.rsplit("|", 1)
+        lines.append(f"- **{name}** (ประมาณ {calories} kcal)")
+    return "🍽️ เมนูที่ตรงกับที่คุณอยากกิน:\n\n" + "\n".join(lines)
+
+
+def format_menu(name, data):
+    desc = data.get("desc", "ไม่มีคำอธิบาย")
+    text = f"🥢 วันนี้ลองกิน **{name}** ดูไหม?\n\n{desc}\n"
+    return text, data.get("img") # Extract image URLs from valid data
+
+
+# Plain random pick, used while the embedding model is still loading
+def plain_random_menu(menu_knowledge):
+    if not menu_knowledge:
+        return "ไม่มีเมนูให้แนะนำ", None
+    name = random.choice(list(menu_knowledge))
+    return format_menu(name, menu_knowledge[name])
+
+
+class Warmup:
+    """Run load() on a background thread so the UI can render before the models are ready.
+
+    With watch=(menu_path, food_path) the bot is then kept in sync with those
+    files by a CatalogWatcher, and .bot always points at the latest catalog.
+    """
+
+    def __init__(self, load, watch=None):
+        self.bot = None
+        self.error = None
+        self.seconds = None
+        self.watcher = None
+        self.ready = threading.Event()
+        self.started = time.perf_counter()
+        threading.Thread(target=self._run, args=(load, watch), name="foodbot-warmup", daemon=True).start()
+
+    def _run(self, load, watch):
+        try:
+            import litellm  # noqa: F401  Pay the import now instead of on the first AI click
+
+            self.bot = load()
+            if watch:
+                self.watcher = CatalogWatcher(self.bot, *watch, on_reload=self._swap)
+        except Exception as e:
+            self.error = e
+            print(f"Warm-up failed: {e}")
+        finally:
+            self.seconds = time.perf_counter() - self.started
+            print(f"Warm-up finished in {self.seconds:.2f}s")
+            self.ready.set()
+
+    def _swap(self, bot):
+        self.bot = bot
+
+    def wait(self, timeout=None):
+        """Block until warm-up is done and return the bot (None if it failed)."""
+        self.ready.wait(timeout)
+        return self.bot
+
+
+class FoodBot:
+    """Everything a recommendation needs, loaded once and shared between requests."""
+
+    def __init__(self, rag_model, menu_knowledge, food_index, embedding_store=None,
+                 tool_workers=TOOL_WORKERS, tool_executor=None):
+        self.rag_model = rag_model
+        self.menu_knowledge = menu_knowledge
+        self.food_index = food_index
+        self.food_data = food_index.items
+        # Embeddings are cached on disk, so restarts don't have to encode the menu again
+        self.embedding_store = embedding_store if embedding_store is not None else EmbeddingStore(RAG_MODEL_NAME)
+        self.food_texts, self.food_imgs = join_catalog(menu_knowledge, self.food_data)
+        with span("build_embeddings"):
+            self.menu_names, menu_matrix = self.build_menu_embeddings()
+            self.menu_key = text_key("\n".join(self.menu_knowledge[name]["desc"] for name in self.menu_names))
+            # float16 / int8 copies when EMBED_PRECISION asks for them, see quantized.py
+            self.menu_matrix = self.compact(menu_matrix, f"menu-{self.menu_key[:16]}")
+            self.food_key = text_key("\n".join(self.food_texts))
+            self.food_matrix = self.compact(self.embed_texts(self.food_texts), f"food-{self.food_key[:16]}")
+        with span("build_index"):
+            self.menu_index = self.build_menu_index()
+        # Tool calls in one AI turn run concurrently on a shared, bounded pool
+        self.tool_executor = tool_executor or ThreadPoolExecutor(max_workers=tool_workers)
+        self.available_functions = {"search_menu": self.search_menu}
+        # Simple requests are turned into search_menu arguments locally, see intent.py
+        self.intent_parser = IntentParser(self.food_data, self.encode)
+
+    @classmethod
+    def load(cls, menu_path="menu.txt", food_path="foodlist.json"):
+        return cls(load_rag_model(), load_menu_from_txt(menu_path), load_food_index(food_path))
+
+    def with_catalog(self, menu_knowledge, food_index):
+        """New bot for another catalog, sharing this one's model, embedding store and tool pool.
+
+        Descriptions that did not change are already in the embedding store,
+        so only new or edited ones are encoded.
+        """
+        return type(self)(self.rag_model, menu_knowledge, food_index, self.embedding_store,
+                          tool_executor=self.tool_executor)
+
+    def prune_cache(self):
+        """Delete what older catalogs left in the cache, once this bot has replaced them.
+
+        Indexes and quantized copies are named after the catalog they were built
+        for, any with another key are removed, and the embedding store is
+        compacted to this catalog's texts. Bots still mapping the removed files
+        keep working, they are only unlinked. Returns the number of files removed.
+        """
+        live = {"index": self.menu_key[:16], "menu": self.menu_key[:16], "food": self.food_key[:16]}
+        removed = 0
+        for entry in os.scandir(self.embedding_store.path):
+            match = re.match(r"(index|menu|food)-([0-9a-f]{16})\.", entry.name)
+            if match and match.group(2) != live[match.group(1)]:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except OSError:
+                    pass  # Already gone (another worker pruned it) or still mapped on Windows
+        descs = [self.menu_knowledge[name]["desc"] for name in self.menu_names]
+        self.embedding_store.compact(descs + self.food_texts)
+        return removed
+
+    def build_menu_embeddings(self):
+        # Only menus with description can be embedded
+        names = [name for name, data in self.menu_knowledge.items() if data.get("desc")]
+        if not names:
+            dim = self.rag_model.get_sentence_embedding_dimension()
+            return np.array([], dtype=object), np.zeros((0, dim), dtype=np.float32)
+
+        # Row i is names[i]
+        descs = [self.menu_knowledge[name]["desc"] for name in names]
+        return np.array(names, dtype=object), self.embed_texts(descs)
+
+    def embed_texts(self, texts):
+        if not texts:
+            return np.zeros((0, self.rag_model.get_sentence_embedding_dimension()), dtype=np.float32)
+        # Only new or changed texts are sent to the model, in batches
+        # (and a process pool for big catalogs, see EMBED_WORKERS)
+        return self.embedding_store.get(
+            texts, lambda missing: encode_texts(self.rag_model, missing, model_name=RAG_MODEL_NAME)
+        )
+
+    def compact(self, matrix, name):
+        return load_or_quantize(matrix, os.path.join(self.embedding_store.path, name))
+
+    def build_menu_index(self):
+        # Build (or load) the search index saved next to the embeddings of this catalog.
+        # Small menus use exact search, big ones an IVF index (see ANN_INDEX, ANN_NPROBE).
+        index_path = os.path.join(self.embedding_store.path, f"index-{self.menu_key[:16]}.npz")
+        return load_or_build_index(self.menu_matrix, index_path)
+
+    def encode(self, text):
+        with span("embed"):
+            return self.rag_model.encode(text, normalize_embeddings=True)
+
+    # Function RAG Random
+    def rag_random_menu(self, query: str = "อยากกินอะไรดี", top_k: int = 16):
+        if not len(self.menu_names):
+            return "ไม่มีเมนูให้แนะนำ", None
+
+        # Embeddings are normalized, so dot score = cosine similarity
+        query_emb = self.encode(query)
+        with span("rag_search"):
+            top_items, scores = self.menu_index.search(query_emb, top_k)
+
+        # Filter to only menus with similarity scores greater than 0.1
+        relevant_items = top_items[scores > 0.1]
+        if relevant_items.size:
+            top_items = relevant_items  # If dosn't have maching menus, Random from all of it
+
+        if not top_items.size:
+            return "ขออภัย ไม่มีเมนูที่เข้ากับความต้องการของคุณเลย", None
+
+        selected_menu = self.menu_names[random.choice(top_items)]
+        return format_menu(selected_menu, self.menu_knowledge[selected_menu])
+
+    def hybrid_search(self, query: str, top_k: int = HYBRID_TOP_K, **filters):
+        """Top k foodlist.json rows that match every filter, ranked by similarity to query.
+
+        Filters are the search_menu ones. Returns a list of (row, score), best first.
+        Only rows left by the attribute mask are scored.
+        """
+        with span("search_menu"):
+            rows = self.food_index.rows(self.food_index.mask(**filters))
+        if not rows.size:
+            return []
+
+        query_emb = self.encode(query)
+        with span("hybrid_rank"):
+            scores = self.food_matrix[rows] @ query_emb
+            top = top_k_indices(scores, top_k)
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+    # Search menu function (Calling by AI)
+    def search_menu(self, query: str = None, spicy: bool = None, seafood: bool = None, meat: str = None, cuisine: str = None, green_level: str = None, max_calories: int = None,
+                    sort: str = None, limit: int = SEARCH_PAGE_SIZE, offset: int = 0):
+        """
+        ค้นหาเมนูอาหารจากฐานข้อมูลตามเงื่อนไขที่กำหนด
+
+        Args:
+            query (str, optional): สิ่งที่ผู้ใช้อยากกิน ใช้เรียงผลลัพธ์ตามความใกล้เคียง.
+            spicy (bool, optional): ต้องการอาหารรสเผ็ดหรือไม่.
+            seafood (bool, optional): ต้องการอาหารทะเลหรือไม่.
+            meat (str, optional): ประเภทของเนื้อสัตว์ที่ต้องการ เช่น 'pork', 'chicken', 'shrimp'.
+            cuisine (str, optional): ประเภทอาหาร เช่น 'thai', 'japanese', 'healthy'.
+            green_level (str, optional): ระดับการทานมังสวิรัติ 'vegetarian' หรือ 'vegan'.
+            max_calories (int, optional): ปริมาณแคลอรี่สูงสุด.
+            sort (str, optional): 'relevance' (ค่าเริ่มต้นเมื่อมี query), 'calories' หรือ 'calories_desc'.
+            limit (int, optional): จำนวนเมนูต่อหน้า.
+            offset (int, optional): เริ่มจากผลลัพธ์ลำดับที่เท่าไร ใช้ขอหน้าถัดไป.
+
+        Returns:
+            dict: {"total", "offset", "next_offset", "items"} โดยแต่ละ item อยู่ในรูป "ชื่อ|แคลอรี่"
+        """
+        limit = max(1, min(int(limit or SEARCH_PAGE_SIZE), MAX_SEARCH_PAGE_SIZE))
+        offset = max(0, int(offset or 0))
+        sort = sort or ("relevance" if query else None)
+
+        # Every filter is a bitwise AND on the precomputed index
+        with span("search_menu"):
+            rows = self.food_index.search(
+                spicy=spicy, seafood=seafood, meat=meat, cuisine=cuisine,
+                green_level=green_level, max_calories=max_calories,
+            )
+            if sort in ("calories", "calories_desc"):
+                order = np.argsort(self.food_index.calorie_rank[rows], kind="stable")
+                rows = rows[order[::-1] if sort == "calories_desc" else order]
+        total = int(rows.size)
+
+        if sort == "relevance" and query and total:
+            # Only rank as deep as this page needs
+            query_emb = self.encode(query)
+            with span("hybrid_rank"):
+                scores = self.food_matrix[rows] @ query_emb
+                rows = rows[top_k_indices(scores, offset + limit)]
+
+        page = rows[offset:offset + limit]
+        result = {
+            "total": total,
+            "offset": offset,
+            "next_offset": offset + len(page) if offset + len(page) < total else None,
+            "items": [f"{self.food_data[i]['name']}|{self.food_data[i]['avg_calories']}" for i in page],
+        }
+        if not total:
+            result["message"] = NO_MATCH_MESSAGE
+        return result
+
+    # Call the local function with arguments provided by the model, result goes back as a tool message
+    def run_tool_call(self, tool_call):
+        function_name = tool_call.function.name
+        try:
+            function_to_call = self.available_functions[function_name]
+            function_args = json.loads(tool_call.function.arguments or "{}")
+            function_response = function_to_call(**function_args)
+        except Exception as e:
+            # Let AI see what went wrong instead of failing the whole answer
+            function_response = f"เรียกใช้ {function_name} ไม่สำเร็จ: {e}"
+        return {
+            "tool_call_id": tool_call.id,
+            "role": "tool",
+            "name": function_name,
+            "content": fit_to_budget(function_response),  # Keep every tool payload inside the token budget
+        }
+
+    def run_tool_calls(self, tool_calls):
+        # Results keep the same order as the calls
+        futures = [self.tool_executor.submit(in_context(self.run_tool_call, tool_call)) for tool_call in tool_calls]
+        return [future.result() for future in futures]
+
+    def local_intent(self, messages, intent_mode=INTENT_MODE, args=None):
+        """Answer the search_menu call locally when the request is simple enough.
+
+        Only the first user message of a conversation is parsed, unless args
+        are given (a chat follow-up that narrows the previous search). On a
+        confident parse the search_menu call and its result are appended to
+        messages as if the AI had asked for them, and the result is returned.
+        Returns None when the normal tool-calling flow should run.
+        """
+        if intent_mode == "off" or not messages or not isinstance(messages[-1], dict) \
+                or messages[-1].get("role") != "user":
+            return None
+        text = messages[-1]["content"]
+        if args is None:
+            if len(messages) != 1:
+                return None
+            with span("intent"):
+                args = self.intent_parser.parse(text)
+        if args is None:
+            metrics.inc("foodbot_intent_total", result="llm")
+            return None
+        metrics.inc("foodbot_intent_total", result=intent_mode)
+
+        args = {"query": text, **args}  # Rank the matches by the request itself
+        result = self.search_menu(**args)
+        tool_call = {"id": "local_intent", "type": "function",
+                     "function": {"name": "search_menu", "arguments": json.dumps(args, ensure_ascii=False)}}
+        messages.append({"role": "assistant", "content": None, "tool_calls": [tool_call]})
+        messages.append({"tool_call_id": "local_intent", "role": "tool", "name": "search_menu",
+                         "content": fit_to_budget(result)})
+        return result
+
+    def ask(self, model_info, messages, on_delta=None, on_tools=None, max_tool_rounds=MAX_TOOL_ROUNDS,
+            intent_mode=INTENT_MODE, intent_args=None):
+        """Run the tool-calling loop and return the final answer text.
+
+        messages is extended in place with every AI and tool message.
+        on_delta(text_so_far) is called while answers stream in,
+        on_tools(tool_calls) before a round of tool calls runs.
+        intent_mode is one of "off", "assist" or "fast", see INTENT_MODE.
+        intent_args are search_menu arguments already known for the last message.
+        """
+        intent_result = self.local_intent(messages, intent_mode, intent_args)
+        if intent_result is not None:
+            if intent_mode == "fast":
+                answer = format_search_answer(intent_result)
+                messages.append({"role": "assistant", "content": answer})
+                return answer
+            max_tool_rounds = 0  # Search already done, AI only writes the answer
+
+        # Keep asking until AI stops calling tools, the last round must answer
+        for tool_round in range(max_tool_rounds + 1):
+            with span("completion"):
+                response = complete(
+                    model_info,
+                    on_delta,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto" if tool_round < max_tool_rounds else "none", # Let AI decide to call function
+                )
+            response_message = response.choices[0].message
+            messages.append(response_message) # Add AI responses to history
+
+            # Check if AI want to call function
+            if not response_message.tool_calls:
+                break
+            if on_tools:
+                on_tools(response_message.tool_calls)
+            messages.extend(self.run_tool_calls(response_message.tool_calls))
+        return response_message.content
+
+    async def aask(self, model_info, messages, limiter=None, max_tool_rounds=MAX_TOOL_ROUNDS,
+                   intent_mode=INTENT_MODE, intent_args=None):
+        """Async version of ask() on litellm.acompletion, without streaming.
+
+        limiter is an optional async context manager (e.g. a semaphore per
+        provider) held around every completion call, or a function that
+        returns one for a model id (needed for the "auto" model).
+        """
+        loop = asyncio.get_running_loop()
+        intent_result = await loop.run_in_executor(None, in_context(self.local_intent, messages, intent_mode, intent_args))
+        if intent_result is not None:
+            if intent_mode == "fast":
+                answer = format_search_answer(intent_result)
+                messages.append({"role": "assistant", "content": answer})
+                return answer
+            max_tool_rounds = 0
+
+        for tool_round in range(max_tool_rounds + 1):
+            with span("completion"):
+                response = await acomplete(
+                    model_info,
+                    limiter,
+                    messages=messages,
+                    tools=tools,
+                    tool_choice="auto" if tool_round < max_tool_rounds else "none",
+                )
+            response_message = response.choices[0].message
+            messages.append(response_message)
+
+            if not response_message.tool_calls:
+                break
+            messages.extend(await asyncio.gather(*[
+                loop.run_in_executor(self.tool_executor, in_context(self.run_tool_call, tool_call))
+                for tool_call in response_message.tool_calls
+            ]))
+        return response_message.content
+
+    def _chat_turn(self, memory, user_text, intent_mode):
+        # Prompt from the chat memory, plus search_menu arguments when a follow-up only narrows the last search
+        messages = memory.messages(user_text)
+        intent_args = None
+        if len(messages) > 1 and intent_mode != "off":
+            intent_args = memory.follow_up_search(self.intent_parser.parse(user_text))
+            if intent_args is None:
+                intent_mode = "off"  # Anything else needs the AI to read the context
+        return messages, intent_mode, intent_args
+
+    def chat(self, model_info, memory, user_text, on_delta=None, on_tools=None, intent_mode=INTENT_MODE):
+        """One turn of a multi-turn chat. memory (a chat_memory.ChatMemory) keeps the history."""
+        messages, intent_mode, intent_args = self._chat_turn(memory, user_text, intent_mode)
+        start = len(messages) - 1
+        answer = self.ask(model_info, messages, on_delta, on_tools, intent_mode=intent_mode, intent_args=intent_args)
+        memory.add_turn(messages[start:])
+        return answer
+
+    async def achat(self, model_info, memory, user_text, limiter=None, intent_mode=INTENT_MODE):
+        """Async version of chat(). Callers must not run two turns on the same memory at once."""
+        # Parsing the follow-up embeds it, keep that off the event loop
+        loop = asyncio.get_running_loop()
+        messages, intent_mode, intent_args = await loop.run_in_executor(
+            None, in_context(self._chat_turn, memory, user_text, intent_mode))
+        start = len(messages) - 1
+        answer = await self.aask(model_info, messages, limiter, intent_mode=intent_mode, intent_args=intent_args)
+        memory.add_turn(messages[start:])
+        return answer
@@ -0,0 +1,138 @@
+"""Local thumbnail cache for the menu.txt image URLs.
+
+Every catalog image is downloaded once, shrunk to IMAGE_MAX_SIZE pixels on
+its longest side and saved as a progressive JPEG, so clients get a small
+local file instead of a multi-megabyte original (or a dead link once an
+upstream URL expires). Thumbnails are content-addressed under
+<cache>/images/blobs/<sha256>.jpg. A small ref file per URL points to its
+blob, so two URLs of the same picture share one file. Once the blobs pass
+IMAGE_CACHE_MAX_MB the least recently used ones are deleted.
+
+Pillow is imported on the first download.
+"""
+import hashlib
+import io
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from embedding_store import CACHE_DIR
+
+IMAGE_PROXY = os.getenv("IMAGE_PROXY", "1") == "1"  # 0 shows the original URLs again
+IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", "640"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "80"))
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "200"))
+IMAGE_FETCH_TIMEOUT = float(os.getenv("IMAGE_FETCH_TIMEOUT", "10"))
+IMAGE_MAX_DOWNLOAD_MB = 20
+FAILURE_TTL = 600  # Seconds before a failed URL is tried again
+
+
+def make_thumbnail(data, max_size=IMAGE_MAX_SIZE, quality=IMAGE_QUALITY):
+    """JPEG bytes of the image in data, at most max_size pixels on its longest side."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)  # Phone photos carry their rotation in EXIF
+        image = image.convert("RGB")
+        image.thumbnail((max_size, max_size))
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+class ImageCache:
+    def __init__(self, cache_dir=None, max_mb=IMAGE_CACHE_MAX_MB, max_size=IMAGE_MAX_SIZE,
+                 quality=IMAGE_QUALITY, timeout=IMAGE_FETCH_TIMEOUT):
+        self.path = os.path.join(cache_dir or CACHE_DIR, "images")
+        self.blob_dir = os.path.join(self.path, "blobs")
+        self.ref_dir = os.path.join(self.path, "refs")
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_size = max_size
+        self.quality = quality
+        self.timeout = timeout
+        self._failures = {}  # url -> time of the last failed download
+        self._lock = threading.Lock()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.ref_dir, exist_ok=True)
+
+    def _ref_path(self, url):
+        # Thumbnail settings are part of the key, changing them fetches again
+        key = hashlib.sha256(f"{url}|{self.max_size}|{self.quality}".encode("utf-8")).hexdigest()
+        return os.path.join(self.ref_dir, key)
+
+    def cached(self, url):
+        """Local path of url's thumbnail if it is already cached, else None."""
+        try:
+            with open(self._ref_path(url), "r", encoding="utf-8") as f:
+                blob_path = os.path.join(self.blob_dir, f.read().strip())
+            os.utime(blob_path)  # Mark as recently used for eviction
+            return blob_path
+        except OSError:
+            return None
+
+    def get(self, url):
+        """Local path of url's thumbnail, downloading it on a miss. None if it can't be fetched."""
+        if not url:
+            return None
+        path = self.cached(url)
+        if path:
+            return path
+        if time.monotonic() - self._failures.get(url, -FAILURE_TTL) < FAILURE_TTL:
+            return None
+        try:
+            thumbnail = make_thumbnail(self._download(url), self.max_size, self.quality)
+        except Exception as e:
+            self._failures[url] = time.monotonic()
+            print(f"Could not cache image {url}: {e}")
+            return None
+        return self._store(url, thumbnail)
+
+    def _download(self, url):
+        request = urllib.request.Request(url, headers={"User-Agent": "FoodBot image cache"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = response.read(IMAGE_MAX_DOWNLOAD_MB * 1024 * 1024 + 1)
+        if len(data) > IMAGE_MAX_DOWNLOAD_MB * 1024 * 1024:
+            raise ValueError(f"image is larger than {IMAGE_MAX_DOWNLOAD_MB} MB")
+        return data
+
+    def _store(self, url, thumbnail):
+        name = hashlib.sha256(thumbnail).hexdigest() + ".jpg"
+        blob_path = os.path.join(self.blob_dir, name)
+        # Write under a temporary name first, readers never see half a file
+        for path, data in ((blob_path, thumbnail), (self._ref_path(url), name.encode("utf-8"))):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        self.evict()
+        return blob_path
+
+    def evict(self):
+        """Delete least recently used thumbnails until the cache fits max_mb."""
+        with self._lock:
+            blobs = []
+            for entry in os.scandir(self.blob_dir):
+                if entry.name.endswith(".jpg"):
+                    stat = entry.stat()
+                    blobs.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in blobs)
+            for _, size, path in sorted(blobs):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)  # Refs to it now miss and download again
+                except FileNotFoundError:
+                    pass  # Another worker evicted it first
+                total -= size
+
+    def prefetch(self, urls, workers=8):
+        """Cache every url in the background, returns the thread doing it."""
+        def run():
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(self.get, sorted({url for url in urls if url})))
+
+        thread = threading.Thread(target=run, name="foodbot-image-prefetch", daemon=True)
+        thread.start()
+        return thread
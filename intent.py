@@ -0,0 +1,149 @@
+"""Local intent parser that turns simple food requests into search_menu arguments.
+
+"อยากกินหมูไม่เผ็ด" -> {"meat": "pork", "spicy": False} without asking the LLM.
+Keyword lexicons are built from the values that actually occur in
+foodlist.json. A parse is only trusted when almost every character of the
+request is explained by known keywords and filler words, nothing negates
+them ("ไม่มีหมู", "no pork"), and the embedding model agrees it looks like a
+food request. Anything else returns None and
+the caller falls back to the normal LLM tool-calling flow.
+"""
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+MIN_COVERAGE = float(os.getenv("INTENT_MIN_COVERAGE", "0.8"))
+MIN_SIMILARITY = float(os.getenv("INTENT_MIN_SIMILARITY", "0.3"))
+
+MEAT_WORDS = {
+    "pork": ["หมู", "pork"],
+    "chicken": ["ไก่", "chicken"],
+    "beef": ["เนื้อวัว", "เนื้อ", "beef"],
+    "shrimp": ["กุ้ง", "shrimp"],
+    "fish": ["ปลา", "fish"],
+    "duck": ["เป็ด", "duck"],
+    "crab": ["ปู", "crab"],
+    "octopus": ["ปลาหมึก", "หมึก", "octopus", "squid"],
+    "lamb": ["เนื้อแกะ", "แกะ", "lamb"],
+}
+CUISINE_WORDS = {
+    "thai": ["อาหารไทย", "ไทย", "thai"],
+    "chinese": ["อาหารจีน", "จีน", "chinese"],
+    "japanese": ["อาหารญี่ปุ่น", "ญี่ปุ่น", "japanese"],
+    "korean": ["อาหารเกาหลี", "เกาหลี", "korean"],
+    "vietnamese": ["เวียดนาม", "vietnamese"],
+    "indian": ["อินเดีย", "indian"],
+    "italian": ["อิตาเลียน", "อิตาลี", "italian"],
+    "french": ["ฝรั่งเศส", "french"],
+    "american": ["อเมริกัน", "american"],
+    "mexican": ["เม็กซิกัน", "mexican"],
+    "middle-eastern": ["ตะวันออกกลาง", "middle eastern"],
+    "singaporean": ["สิงคโปร์", "singaporean"],
+}
+# Longest first, so "ไม่เผ็ด" is consumed before "เผ็ด"
+FLAG_WORDS = [
+    (["ไม่เอาอาหารทะเล", "ไม่ใช่อาหารทะเล", "ไม่ใช่ทะเล", "ไม่เอาทะเล", "ไม่กินทะเล", "no seafood"], "seafood", False),
+    (["อาหารทะเล", "ซีฟู้ด", "ทะเล", "seafood"], "seafood", True),
+    (["ไม่เผ็ด", "ไม่แซ่บ", "not spicy", "mild"], "spicy", False),
+    (["เผ็ดๆ", "แซ่บๆ", "เผ็ด", "แซ่บ", "spicy"], "spicy", True),
+]
+# Words the parser cannot turn into search_menu arguments on its own: negations,
+# lower calorie bounds, diets. Checked after the keywords above are consumed,
+# so "ไม่เอาทะเล" is still a seafood filter but "ไม่เอาหมู" goes to the LLM.
+AMBIGUOUS_WORDS = ["ไม่เอา", "ไม่กิน", "ไม่อยาก", "ไม่ชอบ", "ยกเว้น", "เกิน", "มากกว่า", "มังสวิรัติ", "วีแกน", "เจ",
+                   "คลีน", "สุขภาพ", "healthy", "vegan", "vegetarian", "แพ้", "except", "without", "more than",
+                   "over", "above", "at least"]
+# Any of these left after the keywords are consumed means the request negates something
+# the parser would otherwise read as a filter ("ไม่มีหมู", "no pork", "non-spicy", "pork-free")
+NEGATION_WORDS = ["ไม่", "ห้าม", "ปลอด", "งด", "no", "not", "non", "free", "don't", "dont", "never"]
+FILLER_WORDS = [
+    "อยากกิน", "อยากได้", "อยาก", "กิน", "อะไร", "ดี", "หน่อย", "ที่", "แบบ", "ขอ", "เมนู", "อาหาร", "ของ",
+    "ช่วย", "หา", "แนะนำ", "ให้", "มี", "บ้าง", "ไหม", "มั้ย", "ค่ะ", "คะ", "ครับ", "นะ", "จ้า", "จ้ะ", "หิว",
+    "วันนี้", "มื้อนี้", "เที่ยง", "เย็น", "เช้า", "และ", "กับ", "หรือ", "ๆ",
+    "i", "want", "some", "food", "something", "please", "and", "with",
+]
+# An upper bound word is part of the match, "เกิน 500 kcal" without "ไม่" is left for AMBIGUOUS_WORDS
+CALORIES_PATTERN = re.compile(
+    r"(?:(?:ไม่เกิน|ต่ำกว่า|น้อยกว่า|under|below|less than|max)\s*)?(\d{2,5})\s*(?:kcal|แคลอรี่|แคลลอรี่|แคล|cal)",
+    re.IGNORECASE,
+)
+FOOD_PROTOTYPES = [
+    "อยากกินอะไรดี", "อยากกินอาหารเผ็ดๆ", "หาเมนูหมูไม่เผ็ดให้หน่อย", "แนะนำอาหารญี่ปุ่น",
+    "I want something spicy to eat", "recommend a chicken dish",
+]
+
+
+def _word_pattern(words):
+    """Regex matching any of words, longest first. ASCII words only match whole words, so "i" is not found in "spicy"."""
+    parts = [rf"(?<![a-z]){re.escape(word)}(?![a-z])" if word.isascii() else re.escape(word)
+             for word in sorted(words, key=len, reverse=True)]
+    return re.compile("|".join(parts))
+
+
+AMBIGUOUS_PATTERN = _word_pattern(AMBIGUOUS_WORDS)
+NEGATION_PATTERN = _word_pattern(NEGATION_WORDS)
+FILLER_PATTERN = _word_pattern(FILLER_WORDS)
+
+
+def _content_length(text):
+    # Letters, digits and combining marks. Thai vowel and tone marks are combining
+    # characters that \w does not match, so both sides of the coverage ratio use this.
+    return sum(1 for c in text if unicodedata.category(c)[0] in "LMN")
+
+
+class IntentParser:
+    def __init__(self, food_data, encode=None):
+        meats = {meat for item in food_data for meat in item.get("meat", []) if meat}
+        cuisines = {str(item.get("cuisine", "")).lower() for item in food_data}
+        # Only keep keywords for values that exist in the catalog
+        self.keywords = []  # (word, field, value)
+        for words, field, value in FLAG_WORDS:
+            self.keywords += [(word, field, value) for word in words]
+        for value, words in MEAT_WORDS.items():
+            if value in meats:
+                self.keywords += [(word, "meat", value) for word in words]
+        for value, words in CUISINE_WORDS.items():
+            if value in cuisines:
+                self.keywords += [(word, "cuisine", value) for word in words]
+        self.keywords.sort(key=lambda keyword: len(keyword[0]), reverse=True)
+        self.keywords = [(_word_pattern([word]), field, value) for word, field, value in self.keywords]
+        self.encode = encode
+        self._prototypes = None
+
+    def _looks_like_food_request(self, text):
+        if self.encode is None:
+            return True
+        if self._prototypes is None:
+            self._prototypes = np.stack([self.encode(p) for p in FOOD_PROTOTYPES])
+        return float(np.max(self._prototypes @ self.encode(text))) >= MIN_SIMILARITY
+
+    def parse(self, text: str):
+        """Return search_menu arguments for text, or None when the LLM should decide."""
+        remaining = text.lower().strip()
+        total = _content_length(remaining)
+        if not total:
+            return None
+
+        args = {}
+        match = CALORIES_PATTERN.search(remaining)
+        if match:
+            args["max_calories"] = int(match.group(1))
+            remaining = remaining.replace(match.group(0), " ")
+
+        for pattern, field, value in self.keywords:
+            if pattern.search(remaining):
+                if field in args and args[field] != value:
+                    return None  # Two different meats or cuisines, let the LLM sort it out
+                args[field] = value
+                remaining = pattern.sub(" ", remaining)
+        if not args or AMBIGUOUS_PATTERN.search(remaining) or NEGATION_PATTERN.search(remaining):
+            return None
+
+        remaining = FILLER_PATTERN.sub(" ", remaining)
+        if 1 - _content_length(remaining) / total < MIN_COVERAGE:
+            return None
+        if not self._looks_like_food_request(text):
+            return None
+        return args
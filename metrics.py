@@ -0,0 +1,189 @@
+"""Per-stage latency, token and error metrics.
+
+    with Trace("ai", model="gpt-4o-mini") as trace:
+        with span("completion"):
+            ...
+        trace.add_usage(response.usage)
+
+span() always feeds the process-wide `metrics` registry (exported as
+Prometheus text by prometheus_text()) and, when a Trace is active in the
+current context, also the trace. A finished trace is written as one JSON
+log line on the "foodbot.trace" logger. Recording costs a couple of
+perf_counter calls and one dict update under a lock.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger("foodbot.trace")
+if os.getenv("TRACE_LOG", "1") == "1" and not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+_current_trace = contextvars.ContextVar("foodbot_trace", default=None)
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}  # (name, labels) -> value
+        self.gauges = {}  # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+            bucket = bisect_left(BUCKETS, seconds)
+            if bucket < len(BUCKETS):
+                histogram[bucket] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def prometheus_text(self):
+        """Every metric in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {key: list(value) for key, value in self.histograms.items()}
+
+        lines = []
+        for kind, values in (("counter", counters), ("gauge", gauges)):
+            for name in sorted({name for name, _ in values}):
+                lines.append(f"# TYPE {name} {kind}")
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {value}")
+
+        for name in sorted({name for name, _ in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {histogram[-1]}")
+                lines.append(f"{name}_sum{_labels(labels)} {histogram[-2]}")
+                lines.append(f"{name}_count{_labels(labels)} {histogram[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+metrics = Metrics()
+
+
+class Trace:
+    """Stage timings, token usage and errors of one request."""
+
+    def __init__(self, kind: str, model: str = None):
+        self.kind = kind
+        self.model = model
+        self.stages = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tool_calls = 0
+        self.cache_hit = False
+        self.error = None
+        self.seconds = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_trace.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_trace.reset(self._token)
+        if exc is not None and self.error is None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        self.finish()
+        return False
+
+    def add_usage(self, usage):
+        """Add token counts from a litellm usage object (or dict)."""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else lambda key: getattr(usage, key, 0)
+        prompt_tokens = get("prompt_tokens") or 0
+        completion_tokens = get("completion_tokens") or 0
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        model = self.model or ""
+        metrics.inc("foodbot_tokens_total", prompt_tokens, model=model, type="prompt")
+        metrics.inc("foodbot_tokens_total", completion_tokens, model=model, type="completion")
+
+    def add_tool_calls(self, count: int):
+        self.tool_calls += count
+        metrics.inc("foodbot_tool_calls_total", count, model=self.model or "")
+
+    def mark_cache_hit(self):
+        self.cache_hit = True
+        metrics.inc("foodbot_cache_hits_total", kind=self.kind)
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._started
+        metrics.observe("foodbot_request_seconds", self.seconds, kind=self.kind)
+        metrics.inc("foodbot_requests_total", kind=self.kind, status="error" if self.error else "ok")
+        logger.info(json.dumps(self.to_dict(), ensure_ascii=False))
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "model": self.model,
+            "seconds": round(self.seconds, 4) if self.seconds is not None else None,
+            "stages": [{"stage": name, "seconds": round(seconds, 4)} for name, seconds in self.stages],
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tool_calls": self.tool_calls,
+            "cache_hit": self.cache_hit,
+            "error": self.error,
+        }
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def span(stage: str):
+    """Time one stage into the metrics registry and the current trace."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        metrics.inc("foodbot_errors_total", stage=stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        metrics.observe("foodbot_stage_seconds", seconds, stage=stage)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.stages.append((stage, seconds))
@@ -0,0 +1,159 @@
+"""Deterministic OpenAI-compatible chat endpoint for local runs and tests.
+
+    python mock_llm.py --port 8001
+    LLM_API_BASE=http://localhost:8001/v1 python service.py
+
+The first turn of a request with tools returns a search_menu call built from
+a few Thai keywords, later turns answer with the first menu from the tool
+result. Streaming (SSE) is supported, and --delay adds latency per reply.
+
+--slow and --fail make it a misbehaving provider for the auto model router,
+per model name (a substring of the request's "model"):
+
+    python mock_llm.py --slow llama-3.1-8b=3 --fail gpt-4o-mini=0.5:429
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+KEYWORD_ARGS = [
+    ("ไม่เผ็ด", {"spicy": False}),
+    ("เผ็ด", {"spicy": True}),
+    ("แซ่บ", {"spicy": True}),
+    ("ไม่ใช่ทะเล", {"seafood": False}),
+    ("ทะเล", {"seafood": True}),
+    ("หมู", {"meat": "pork"}),
+    ("ไก่", {"meat": "chicken"}),
+    ("เนื้อ", {"meat": "beef"}),
+    ("กุ้ง", {"meat": "shrimp"}),
+    ("ญี่ปุ่น", {"cuisine": "japanese"}),
+]
+
+
+def search_args(text):
+    args = {}
+    for keyword, values in KEYWORD_ARGS:
+        if keyword in text:
+            for key, value in values.items():
+                args.setdefault(key, value)  # First match wins, so "ไม่เผ็ด" beats "เผ็ด"
+    return args
+
+
+def mock_reply(body):
+    """Return (message, finish_reason) for an OpenAI style request body."""
+    messages = body.get("messages", [])
+    last = messages[-1] if messages else {"role": "user", "content": ""}
+    if body.get("tools") and body.get("tool_choice") != "none" and last.get("role") == "user":
+        arguments = json.dumps(search_args(last.get("content") or ""), ensure_ascii=False)
+        tool_call = {"id": "call_0", "type": "function",
+                     "function": {"name": "search_menu", "arguments": arguments}}
+        return {"role": "assistant", "content": None, "tool_calls": [tool_call]}, "tool_calls"
+
+    menus = []
+    for message in messages:
+        if message.get("role") == "tool":
+            try:
+                result = json.loads(message.get("content") or "[]")
+            except ValueError:
+                continue
+            # search_menu pages look like {"items": ["name|kcal", ...]}
+            menus.extend(result.get("items", []) if isinstance(result, dict) else result)
+    if menus:
+        content = f"ลองกิน {menus[0].split('|')[0]} ดูไหม อร่อยและตรงกับที่ต้องการ"
+    else:
+        content = "ลองกินข้าวกะเพราไข่ดาวดูไหม ง่ายและอร่อย"
+    return {"role": "assistant", "content": content}, "stop"
+
+
+def usage_of(body, message):
+    prompt_tokens = sum(len(str(m.get("content") or "")) for m in body.get("messages", [])) // 4
+    completion_tokens = len(message.get("content") or json.dumps(message.get("tool_calls"))) // 4
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def parse_faults(slow=(), fail=()):
+    """["llama=3"] and ["gpt=0.5:429"] -> {"llama": {"delay": 3.0}, "gpt": {"fail_rate": 0.5, "status": 429}}"""
+    faults = {}
+    for spec in slow:
+        pattern, seconds = spec.split("=", 1)
+        faults.setdefault(pattern, {})["delay"] = float(seconds)
+    for spec in fail:
+        pattern, rate = spec.split("=", 1)
+        rate, _, status = rate.partition(":")
+        faults.setdefault(pattern, {}).update(fail_rate=float(rate), status=int(status or 429))
+    return faults
+
+
+async def handle_chat(request):
+    body = await request.json()
+    await asyncio.sleep(request.app["delay"])
+    for pattern, fault in request.app["faults"].items():
+        if pattern not in body.get("model", ""):
+            continue
+        await asyncio.sleep(fault.get("delay", 0))
+        if request.app["random"].random() < fault.get("fail_rate", 0):
+            status = fault["status"]
+            error_type = "rate_limit_error" if status == 429 else "server_error"
+            return web.json_response({"error": {"message": f"mock {error_type}", "type": error_type}},
+                                     status=status, headers={"Retry-After": "1"} if status == 429 else None)
+    message, finish_reason = mock_reply(body)
+    base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": body.get("model", "mock")}
+
+    if not body.get("stream"):
+        return web.json_response({
+            **base, "object": "chat.completion",
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage_of(body, message),
+        })
+
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+
+    async def send(delta, finish=None):
+        chunk = {**base, "object": "chat.completion.chunk",
+                 "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]}
+        await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+    if message.get("tool_calls"):
+        await send({"role": "assistant", "tool_calls": [{"index": 0, **message["tool_calls"][0]}]})
+    else:
+        words = message["content"].split(" ")
+        for i, word in enumerate(words):
+            await send({"role": "assistant", "content": word if i == len(words) - 1 else word + " "})
+    await send({}, finish_reason)
+    await response.write(b"data: [DONE]\n\n")
+    return response
+
+
+def create_app(delay=0.0, faults=None, seed=0):
+    app = web.Application()
+    app["delay"] = delay
+    app["faults"] = faults or {}
+    app["random"] = random.Random(seed)  # Failures are reproducible from run to run
+    app.add_routes([web.post("/v1/chat/completions", handle_chat),
+                    web.post("/chat/completions", handle_chat)])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI-compatible LLM endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before every reply")
+    parser.add_argument("--slow", action="append", default=[], metavar="MODEL=SECONDS",
+                        help="extra delay for models whose name contains MODEL")
+    parser.add_argument("--fail", action="append", default=[], metavar="MODEL=RATE[:STATUS]",
+                        help="fail that share of requests to MODEL with STATUS (default 429)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    app = create_app(args.delay, parse_faults(args.slow, args.fail), args.seed)
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""Latency-aware "auto" model with hedged requests and failover.
+
+The router keeps rolling latency and error stats for every configured model
+and tries them best first. If the first model has not started answering
+after ROUTER_HEDGE_DELAY seconds, the same request also goes to the next
+model. The first one to answer wins and the other one is cancelled. Errors
+(timeouts, 429, 5xx...) move on to the next model without the caller
+noticing, and a model that returned 429 sits out ROUTER_COOLDOWN seconds.
+
+The router does not know about litellm: callers hand it a function that
+runs one request on a given model_info.
+
+    python mock_llm.py --slow llama-3.1-8b=3 --fail gpt-4o-mini=0.5:429
+    LLM_API_BASE=http://localhost:8001/v1 DEFAULT_MODEL=auto python service.py
+"""
+import asyncio
+import os
+import queue
+import statistics
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+AUTO_MODEL_ID = "auto"
+HEDGE_DELAY = float(os.getenv("ROUTER_HEDGE_DELAY", "2.0"))
+REQUEST_TIMEOUT = float(os.getenv("ROUTER_TIMEOUT", "30"))
+COOLDOWN = float(os.getenv("ROUTER_COOLDOWN", "30"))
+WINDOW = int(os.getenv("ROUTER_WINDOW", "50"))
+UNKNOWN_LATENCY = 1.0  # Seconds assumed for a model without samples, so new models get tried
+
+
+def status_of(error):
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+class ModelStats:
+    def __init__(self, window=WINDOW):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)  # True for success
+        self.cooldown_until = 0.0
+
+    def score(self):
+        """Expected seconds to a good answer: median latency / success rate."""
+        latency = statistics.median(self.latencies) if self.latencies else UNKNOWN_LATENCY
+        success = sum(self.outcomes) / len(self.outcomes) if self.outcomes else 1.0
+        return latency / max(success, 0.05)
+
+
+class ModelRouter:
+    def __init__(self, hedge_delay=HEDGE_DELAY, timeout=REQUEST_TIMEOUT, cooldown=COOLDOWN):
+        self.hedge_delay = hedge_delay
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, model_id):
+        with self._lock:
+            return self.stats.setdefault(model_id, ModelStats())
+
+    def ranked(self, candidates):
+        """Candidates best first, models cooling down after a 429 go last."""
+        now = time.monotonic()
+        return sorted(candidates, key=lambda info: (self._stats(info["id"]).cooldown_until > now,
+                                                    self._stats(info["id"]).score()))
+
+    def record(self, model_id, seconds, error=None, cancelled=False):
+        stats = self._stats(model_id)
+        with self._lock:
+            if cancelled:
+                pass  # Stopped before it finished: how long it would have taken, or whether it works, is unknown
+            elif error is None:
+                stats.latencies.append(seconds)
+                stats.outcomes.append(True)
+            else:
+                stats.outcomes.append(False)
+                if status_of(error) == 429:
+                    stats.cooldown_until = time.monotonic() + self.cooldown
+            score = stats.score()
+        result = "cancelled" if cancelled else "ok" if error is None else "error"
+        metrics.inc("foodbot_router_requests_total", model=model_id, result=result)
+        metrics.set("foodbot_router_score_seconds", score, model=model_id)
+
+    def snapshot(self):
+        """Per-model stats for the debug panel."""
+        now = time.monotonic()
+        return {
+            model_id: {
+                "score_s": round(stats.score(), 3),
+                "samples": len(stats.outcomes),
+                "error_rate": round(1 - sum(stats.outcomes) / len(stats.outcomes), 3) if stats.outcomes else 0.0,
+                "cooling_down": stats.cooldown_until > now,
+            }
+            for model_id, stats in list(self.stats.items())
+        }
+
+    def run(self, candidates, call, on_delta=None):
+        """Run call(model_info, claim, emit) on the best candidate, hedged and with failover.
+
+        call runs on a worker thread and must call claim() when the model
+        starts answering (e.g. on the first streamed chunk). claim() returns
+        False when another attempt already won, call should then stop reading
+        and return. Text passed to emit(text) by the winner reaches
+        on_delta(text) on the caller's thread. Returns (model_info, result)
+        of the winner.
+        """
+        if not candidates:
+            raise RuntimeError("no model is available for auto routing")
+        pending = deque(self.ranked(candidates))
+        events = queue.Queue()
+        state = {"winner": None}
+        lock = threading.Lock()
+
+        def start():
+            model_info = pending.popleft()
+            attempt_start = time.monotonic()
+
+            def claim():
+                with lock:
+                    if state["winner"] is None:
+                        state["winner"] = model_info["id"]
+                    return state["winner"] == model_info["id"]
+
+            def emit(text):
+                events.put(("delta", model_info, text))
+
+            def attempt():
+                try:
+                    result, error = call(model_info, claim, emit), None
+                except Exception as e:
+                    result, error = None, e
+                    with lock:
+                        if state["winner"] == model_info["id"]:
+                            state["winner"] = None  # Failed after it started answering, let the next one in
+                lost = error is None and not claim()
+                self.record(model_info["id"], time.monotonic() - attempt_start, error, cancelled=lost)
+                events.put(("done", model_info, (result, error, lost)))
+
+            threading.Thread(target=attempt, name=f"router-{model_info['id']}", daemon=True).start()
+
+        start()
+        running = 1
+        hedged = False
+        last_error = None
+        deadline = time.monotonic() + self.timeout
+        while running:
+            wait = deadline - time.monotonic()
+            if not hedged and pending:
+                wait = min(wait, self.hedge_delay)
+            try:
+                kind, model_info, payload = events.get(timeout=max(wait, 0))
+            except queue.Empty:
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"no model answered within {self.timeout:.0f}s")
+                if state["winner"] is None and pending:
+                    # Slow first answer: send the same request to the next model too
+                    hedged = True
+                    metrics.inc("foodbot_router_hedges_total")
+                    start()
+                    running += 1
+                continue
+
+            if kind == "delta":
+                if on_delta and state["winner"] == model_info["id"]:
+                    on_delta(payload)
+                continue
+            running -= 1
+            result, error, lost = payload
+            if error is None and not lost:
+                return model_info, result
+            if error is not None:
+                last_error = error
+                if not running and pending:
+                    metrics.inc("foodbot_router_failovers_total")
+                    start()
+                    running += 1
+        raise last_error or RuntimeError("every model failed")
+
+    async def arun(self, candidates, call):
+        """Async run(): call(model_info) is a coroutine, losers are cancelled as tasks."""
+        if not candidates:
+            raise RuntimeError("no model is available for auto routing")
+        pending = deque(self.ranked(candidates))
+        tasks = {}
+        hedged = False
+        last_error = None
+
+        def start():
+            model_info = pending.popleft()
+            tasks[asyncio.ensure_future(asyncio.wait_for(call(model_info), self.timeout))] = (model_info, time.monotonic())
+
+        start()
+        try:
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=None if hedged or not pending else self.hedge_delay,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    hedged = True
+                    metrics.inc("foodbot_router_hedges_total")
+                    start()
+                    continue
+                for task in done:
+                    model_info, started = tasks.pop(task)
+                    error = task.exception()
+                    self.record(model_info["id"], time.monotonic() - started, error)
+                    if error is None:
+                        return model_info, task.result()
+                    last_error = error
+                if not tasks and pending:
+                    metrics.inc("foodbot_router_failovers_total")
+                    start()
+            raise last_error or RuntimeError("every model failed")
+        finally:
+            for task, (model_info, started) in tasks.items():
+                task.cancel()
+                self.record(model_info["id"], time.monotonic() - started, cancelled=True)
+
+
+# One router per process, so every session and request feeds the same stats
+router = ModelRouter()
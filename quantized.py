@@ -0,0 +1,117 @@
+"""Compact float16 / int8 copies of the embedding matrices.
+
+    EMBED_PRECISION=int8 streamlit run streamlit_app.py
+
+The embedding store keeps float32 vectors as the source of truth. With
+EMBED_PRECISION set to float16 (half the memory) or int8 (a quarter, plus
+one float32 scale per row) FoodBot scores against a quantized copy instead.
+The copy is one contiguous .npy buffer per matrix, saved next to the
+embeddings and opened with mmap, so every worker process on the machine
+shares the same pages. Scores are computed on the quantized rows in chunks,
+a full float32 matrix is never materialized.
+
+int8 is the one to pick for big catalogs: about 2x the float32 search time
+for a quarter of the memory. NumPy converts float16 slowly, so float16 is
+much slower to score. `python bench.py` reports memory, top-k
+recall and latency of all three.
+"""
+import os
+
+import numpy as np
+
+EMBED_PRECISION = os.getenv("EMBED_PRECISION", "float32")  # float32, float16 or int8
+PRECISIONS = ("float32", "float16", "int8")
+CHUNK_ROWS = 1024  # Rows converted to float32 at a time, small enough to stay in cache
+
+
+class QuantizedMatrix:
+    """Read-only matrix of quantized rows, usable wherever the indexes expect a float32 matrix.
+
+    Supports matrix @ query, matrix[rows] / matrix[start:stop] and np.asarray(matrix).
+    int8 rows are stored as round(row / scale) with scale = max(|row|) / 127.
+    """
+
+    def __init__(self, data, scales=None):
+        self.data = data
+        self.scales = scales  # None for float16
+        self.shape = data.shape
+        self.precision = str(data.dtype)
+
+    @classmethod
+    def quantize(cls, matrix, precision):
+        if precision == "float16":
+            return cls(np.asarray(matrix, dtype=np.float16))
+        if precision != "int8":
+            raise ValueError(f"unknown precision {precision}")
+        data = np.empty(matrix.shape, dtype=np.int8)
+        scales = np.empty(matrix.shape[0], dtype=np.float32)
+        for start in range(0, matrix.shape[0], CHUNK_ROWS):
+            block = np.asarray(matrix[start:start + CHUNK_ROWS], dtype=np.float32)
+            block_scales = np.maximum(np.abs(block).max(axis=1, initial=0.0), 1e-12) / 127
+            data[start:start + CHUNK_ROWS] = np.rint(block / block_scales[:, None])
+            scales[start:start + CHUNK_ROWS] = block_scales
+        return cls(data, scales)
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, rows):
+        return QuantizedMatrix(self.data[rows], self.scales[rows] if self.scales is not None else None)
+
+    def __matmul__(self, query):
+        query = np.asarray(query, dtype=np.float32)
+        scores = np.empty(self.shape[0], dtype=np.float32)
+        for start in range(0, self.shape[0], CHUNK_ROWS):
+            scores[start:start + CHUNK_ROWS] = self.data[start:start + CHUNK_ROWS].astype(np.float32) @ query
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def __array__(self, dtype=None, copy=None):
+        matrix = self.data.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+    def save(self, path):
+        # Write to temporary files first, a reader never maps a half-written buffer
+        for suffix, array in (("data", self.data), ("scales", self.scales)):
+            if array is not None:
+                np.save(f"{path}.{suffix}.tmp.npy", array)
+        if self.scales is not None:
+            os.replace(f"{path}.scales.tmp.npy", f"{path}.scales.npy")
+        os.replace(f"{path}.data.tmp.npy", f"{path}.data.npy")
+
+    @classmethod
+    def load(cls, path, precision):
+        data = np.load(f"{path}.data.npy", mmap_mode="r")
+        if str(data.dtype) != precision:
+            raise ValueError(f"{path} holds {data.dtype}, not {precision}")
+        scales = np.load(f"{path}.scales.npy", mmap_mode="r") if precision == "int8" else None
+        return cls(data, scales)
+
+
+def load_or_quantize(matrix, path, precision=EMBED_PRECISION):
+    """Quantized copy of matrix, mapped from path when it was saved before.
+
+    path should identify the matrix content (e.g. a hash of its texts).
+    float32 returns matrix unchanged.
+    """
+    if precision not in PRECISIONS:
+        raise ValueError(f"EMBED_PRECISION must be one of {', '.join(PRECISIONS)}, not {precision}")
+    if precision == "float32":
+        return matrix
+    path = f"{path}.{precision}"
+    try:
+        quantized = QuantizedMatrix.load(path, precision)
+        if quantized.shape == matrix.shape:
+            return quantized
+    except (FileNotFoundError, ValueError):
+        pass
+    quantized = QuantizedMatrix.quantize(matrix, precision)
+    quantized.save(path)
+    return QuantizedMatrix.load(path, precision)
@@ -0,0 +1,86 @@
+"""Semantic cache for final AI answers.
+
+Entries are keyed by model id plus the normalized embedding of the user input,
+a lookup returns the stored answer of the most similar earlier question when
+the cosine similarity is at least `threshold`. Entries expire after `ttl`
+seconds and the least recently used ones are evicted past `max_entries`.
+Optionally every entry is also written to a SQLite file so the cache survives
+restarts.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = 0.92, ttl: float = 3600, max_entries: int = 1000,
+                 db_path: str = None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (model_id, embedding, answer, created), oldest first
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, model TEXT, embedding BLOB, answer TEXT, created REAL)"
+            )
+            self._load_from_db()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load_from_db(self):
+        rows = self._db.execute(
+            "SELECT key, model, embedding, answer, created FROM responses "
+            "WHERE created > ? ORDER BY created DESC LIMIT ?",
+            (time.time() - self.ttl, self.max_entries),
+        ).fetchall()
+        for key, model_id, embedding, answer, created in reversed(rows):
+            self._entries[key] = (model_id, np.frombuffer(embedding, dtype=np.float32), answer, created)
+
+    def _delete(self, keys):
+        for key in keys:
+            del self._entries[key]
+        if self._db and keys:
+            self._db.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+            self._db.commit()
+
+    def get(self, model_id: str, embedding):
+        """Return the cached answer for a similar question, or None."""
+        with self._lock:
+            now = time.time()
+            self._delete([key for key, entry in self._entries.items() if now - entry[3] > self.ttl])
+
+            keys = [key for key, entry in self._entries.items() if entry[0] == model_id]
+            if not keys:
+                return None
+            scores = np.stack([self._entries[key][1] for key in keys]) @ embedding
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+
+            self._entries.move_to_end(keys[best])
+            return self._entries[keys[best]][2]
+
+    def put(self, model_id: str, embedding, answer: str):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        key = uuid.uuid4().hex
+        created = time.time()
+        with self._lock:
+            self._entries[key] = (model_id, embedding, answer, created)
+            if self._db:
+                self._db.execute(
+                    "INSERT INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, model_id, embedding.tobytes(), answer, created),
+                )
+                self._db.commit()
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._delete(list(self._entries)[:overflow])
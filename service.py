@@ -0,0 +1,271 @@
+"""Headless HTTP API for the FoodBot, for frontends other than Streamlit.
+
+    python service.py --port 8080
+
+    POST /recommend  {"prompt": "อยากกินอะไรแซ่บๆ", "model": "groq/llama-3.1-8b-instant", "mode": "fast"}
+                     "model": "auto" routes between the providers, see model_router.py
+    POST /chat       {"session": "abc", "prompt": "ขอแบบไม่เผ็ด"}   multi-turn, see chat_memory.py
+    POST /random     {"query": "อยากกินอะไรดี"}
+    POST /search     {"spicy": false, "meat": "pork"}
+    GET  /images/<sha256>.jpg   cached thumbnail of a menu image, see image_cache.py
+    POST /retrieve   {"query": "ต้มยำ", "top_k": 10, "seafood": true}   filtered, ranked, with scores
+    GET  /health
+    GET  /metrics    Prometheus text format
+
+LLM calls go through litellm.acompletion on one shared keep-alive HTTP client,
+with at most PROVIDER_CONCURRENCY calls in flight per provider. Set
+LLM_API_BASE to point every model at another endpoint, e.g. mock_llm.py.
+Edits to menu.txt and foodlist.json are picked up while running, see
+catalog_watcher.py.
+"""
+import argparse
+import asyncio
+import os
+import re
+from collections import OrderedDict
+
+import httpx
+import litellm
+from aiohttp import web
+
+from catalog_watcher import CATALOG_POLL_SECONDS, CatalogWatcher
+from chat_memory import ChatMemory
+from image_cache import ImageCache
+from foodbot_core import INTENT_MODE, MODELS, FoodBot, in_context
+from metrics import Trace, metrics
+from model_router import AUTO_MODEL_ID
+from response_cache import SemanticCache
+
+PROVIDER_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "8"))
+LLM_API_BASE = os.getenv("LLM_API_BASE")
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "groq/llama-3.1-8b-instant")
+CHAT_SESSIONS = int(os.getenv("CHAT_SESSIONS", "1000"))
+
+
+def provider_of(model_id: str) -> str:
+    return model_id.split("/", 1)[0] if "/" in model_id else "openai"
+
+
+def resolve_model(name: str):
+    """Find a model by its id or its label in MODELS, None if it is unknown."""
+    for label, info in MODELS.items():
+        if name in (label, info["id"]):
+            model_info = dict(info)
+            break
+    else:
+        if not LLM_API_BASE:
+            return None
+        model_info = {"id": name, "api_key": "mock"}  # Any model id works against a custom endpoint
+    if LLM_API_BASE:
+        model_info["api_base"] = LLM_API_BASE
+        model_info["api_key"] = model_info.get("api_key") or "mock"  # Custom endpoints such as mock_llm.py take any key
+    if model_info["id"] == AUTO_MODEL_ID:
+        model_info["candidates"] = [
+            candidate for candidate in (resolve_model(info["id"]) for info in MODELS.values() if info["id"] != AUTO_MODEL_ID)
+            if candidate.get("api_key")
+        ]
+    return model_info
+
+
+def current_bot(request):
+    # Read once per request, so a catalog reload never changes the bot halfway through
+    return request.app["catalog"].bot
+
+
+def provider_limit(app, model_id):
+    limits = app["provider_limits"]
+    provider = provider_of(model_id)
+    if provider not in limits:
+        limits[provider] = asyncio.Semaphore(PROVIDER_CONCURRENCY)
+    return limits[provider]
+
+
+def read_prompt(body):
+    """(prompt, model_info, mode, error) from a /recommend or /chat body, error is None when it is valid."""
+    prompt = (body.get("prompt") or "").strip()
+    if not prompt:
+        return None, None, None, "prompt is required"
+    model_info = resolve_model(body.get("model") or DEFAULT_MODEL)
+    if not model_info or not model_info.get("api_key"):
+        return None, None, None, f"model {body.get('model')} is not available"
+    mode = body.get("mode") or INTENT_MODE  # "off", "assist" or "fast", see foodbot_core.INTENT_MODE
+    if mode not in ("off", "assist", "fast"):
+        return None, None, None, f"unknown mode {mode}"
+    return prompt, model_info, mode, None
+
+
+async def handle_recommend(request):
+    bot = current_bot(request)
+    prompt, model_info, mode, error = read_prompt(await request.json())
+    if error:
+        return web.json_response({"error": error}, status=400)
+
+    with Trace("recommend", model=model_info["id"]) as trace:
+        loop = asyncio.get_running_loop()
+        query_emb = await loop.run_in_executor(None, in_context(bot.encode, prompt))
+        answer = request.app["response_cache"].get(model_info["id"], query_emb)
+        if answer:
+            trace.mark_cache_hit()
+            return web.json_response({"answer": answer, "model": model_info["id"], "cached": True})
+
+        try:
+            answer = await bot.aask(
+                model_info,
+                [{"role": "user", "content": prompt}],
+                limiter=lambda model_id: provider_limit(request.app, model_id),
+                intent_mode=mode,
+            )
+        except Exception as e:
+            trace.error = f"{type(e).__name__}: {e}"
+            return web.json_response({"error": f"LLM request failed: {e}"}, status=502)
+    if answer and mode != "fast":
+        request.app["response_cache"].put(model_info["id"], query_emb, answer)
+    return web.json_response({"answer": answer, "model": model_info["id"], "cached": False})
+
+
+async def handle_chat(request):
+    body = await request.json()
+    prompt, model_info, mode, error = read_prompt(body)
+    if error:
+        return web.json_response({"error": error}, status=400)
+    session_id = str(body.get("session") or "")
+    if not session_id:
+        return web.json_response({"error": "session is required"}, status=400)
+
+    # Least recently used sessions are dropped first once there are CHAT_SESSIONS of them
+    sessions = request.app["chat_sessions"]
+    memory, lock = sessions.pop(session_id, None) or (ChatMemory(), asyncio.Lock())
+    sessions[session_id] = memory, lock
+    while len(sessions) > CHAT_SESSIONS:
+        sessions.popitem(last=False)
+
+    # Turns of one session run one at a time, so they are stored (and folded) in order
+    async with lock:
+        with Trace("chat", model=model_info["id"]) as trace:
+            try:
+                answer = await current_bot(request).achat(
+                    model_info, memory, prompt,
+                    limiter=lambda model_id: provider_limit(request.app, model_id),
+                    intent_mode=mode,
+                )
+            except Exception as e:
+                trace.error = f"{type(e).__name__}: {e}"
+                return web.json_response({"error": f"LLM request failed: {e}"}, status=502)
+    return web.json_response({"answer": answer, "model": model_info["id"], "turns": len(memory.history())})
+
+
+async def handle_random(request):
+    body = await request.json() if request.can_read_body else {}
+    query = body.get("query") or "อยากกินอะไรดี"
+    loop = asyncio.get_running_loop()
+    with Trace("random"):
+        text, img = await loop.run_in_executor(None, in_context(current_bot(request).rag_random_menu, query))
+        thumb = await loop.run_in_executor(None, request.app["image_cache"].get, img)
+    return web.json_response({"text": text, "img": img, "thumb": thumb and f"/images/{os.path.basename(thumb)}"})
+
+
+async def handle_image(request):
+    name = request.match_info["name"]
+    path = os.path.join(request.app["image_cache"].blob_dir, name)
+    if not re.fullmatch(r"[0-9a-f]{64}\.jpg", name) or not os.path.exists(path):
+        raise web.HTTPNotFound()
+    # Names are content hashes, so a thumbnail never changes
+    return web.FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
+async def handle_search(request):
+    filters = await request.json() if request.can_read_body else {}
+    loop = asyncio.get_running_loop()
+    try:
+        with Trace("search"):
+            # A query is embedded for ranking, keep that off the event loop
+            results = await loop.run_in_executor(None, in_context(current_bot(request).search_menu, **filters))
+    except (TypeError, ValueError) as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response({"results": results})
+
+
+async def handle_retrieve(request):
+    body = await request.json()
+    query = body.pop("query", None)
+    if not query:
+        return web.json_response({"error": "query is required"}, status=400)
+    try:
+        top_k = int(body.pop("top_k", 10))
+    except (TypeError, ValueError):
+        top_k = 0
+    if top_k < 1:
+        return web.json_response({"error": "top_k must be a positive integer"}, status=400)
+
+    bot = current_bot(request)
+    loop = asyncio.get_running_loop()
+    try:
+        with Trace("retrieve"):
+            ranked = await loop.run_in_executor(None, in_context(bot.hybrid_search, query, top_k, **body))
+    except TypeError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    return web.json_response({"results": [
+        {**bot.food_data[row], "img": bot.food_imgs[row], "score": round(score, 4)}
+        for row, score in ranked
+    ]})
+
+
+async def handle_health(request):
+    return web.json_response({"status": "ok"})
+
+
+async def handle_metrics(request):
+    return web.Response(text=metrics.prometheus_text(), content_type="text/plain")
+
+
+async def open_http_client(app):
+    # One pooled client for every LLM call, so connections to providers are reused
+    litellm.aclient_session = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=PROVIDER_CONCURRENCY * 4, max_keepalive_connections=PROVIDER_CONCURRENCY * 2),
+        timeout=httpx.Timeout(60.0),
+    )
+
+
+async def close_http_client(app):
+    await litellm.aclient_session.aclose()
+
+
+async def stop_catalog_watcher(app):
+    app["catalog"].stop()
+
+
+def create_app(bot, response_cache=None, catalog_poll=0):
+    """catalog_poll > 0 reloads menu.txt / foodlist.json every that many seconds when they change."""
+    app = web.Application()
+    app["catalog"] = CatalogWatcher(bot, interval=catalog_poll)
+    app["response_cache"] = response_cache if response_cache is not None else SemanticCache()
+    app["provider_limits"] = {}
+    app["chat_sessions"] = OrderedDict()  # session id -> (ChatMemory, asyncio.Lock)
+    app["image_cache"] = ImageCache()
+    app.on_startup.append(open_http_client)
+    app.on_cleanup.append(close_http_client)
+    app.on_cleanup.append(stop_catalog_watcher)
+    app.add_routes([
+        web.post("/recommend", handle_recommend),
+        web.post("/chat", handle_chat),
+        web.post("/random", handle_random),
+        web.post("/search", handle_search),
+        web.post("/retrieve", handle_retrieve),
+        web.get("/images/{name}", handle_image),
+        web.get("/health", handle_health),
+        web.get("/metrics", handle_metrics),
+    ])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the FoodBot HTTP service")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    web.run_app(create_app(FoodBot.load(), catalog_poll=CATALOG_POLL_SECONDS), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
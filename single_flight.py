@@ -0,0 +1,167 @@
+"""Share one upstream LLM call between identical requests that are in flight together.
+
+When many sessions send the same prompt at once ("กินอะไรดี" at noon), the
+first request (the leader) calls the provider and every identical request
+that arrives before it finishes waits for that answer instead of calling
+again. Requests are identical when the model id, the messages (whitespace
+normalized) and the tools match. In do() the call runs on a worker thread
+and every caller streams the shared text on its own thread. Nothing is kept
+after the call returns, finished answers are the response cache's job (response_cache.py).
+
+Exported metrics: foodbot_singleflight_requests_total{role="leader"|"follower"},
+foodbot_singleflight_waiting (requests currently waiting on a leader) and
+foodbot_singleflight_coalesced_ratio (followers / all requests).
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import re
+import threading
+
+from metrics import metrics
+
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "1") == "1"
+
+
+def _plain(message):
+    # litellm Message objects and plain dicts end up as the same dict
+    if not isinstance(message, dict):
+        message = message.model_dump() if hasattr(message, "model_dump") else dict(message)
+    plain = {key: message.get(key) for key in ("role", "content", "name", "tool_call_id", "tool_calls")
+             if message.get(key) is not None}
+    if isinstance(plain.get("content"), str):
+        plain["content"] = re.sub(r"\s+", " ", plain["content"]).strip()
+    return plain
+
+
+def request_key(model_id, messages, tools=None, tool_choice=None):
+    payload = json.dumps([model_id, [_plain(m) for m in messages], tools, tool_choice],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.changed = threading.Condition()
+        self.done = False
+        self.abandoned = False  # Ended by a BaseException, followers start over
+        self.text = None  # Latest text passed to emit()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.waiting = 0
+
+    def _count(self, leader):
+        with self._lock:
+            if leader:
+                self.leaders += 1
+            else:
+                self.followers += 1
+            ratio = self.followers / (self.leaders + self.followers)
+        metrics.inc("foodbot_singleflight_requests_total", role="leader" if leader else "follower")
+        metrics.set("foodbot_singleflight_coalesced_ratio", ratio)
+
+    def _wait(self, change):
+        with self._lock:
+            self.waiting += change
+            waiting = self.waiting
+        metrics.set("foodbot_singleflight_waiting", waiting)
+
+    def do(self, key, fn, on_delta=None):
+        """Return (fn(emit), shared). shared is True when another caller's result was reused.
+
+        fn runs once per key on a worker thread. Text it passes to emit(text)
+        reaches on_delta(text) of every caller, on that caller's own thread,
+        so a UI callback that raises (e.g. Streamlit stopping a script) only
+        ends its own caller and never the shared call. Exceptions of fn are
+        shared, anything else (BaseException) is raised to the leader only and
+        the followers start over.
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+            self._count(leader)
+            if leader:
+                threading.Thread(target=contextvars.copy_context().run, args=(self._run, key, call, fn),
+                                 name="foodbot-singleflight", daemon=True).start()
+            else:
+                self._wait(+1)
+            try:
+                self._follow(call, on_delta)
+            finally:
+                if not leader:
+                    self._wait(-1)
+            if call.abandoned and not leader:
+                continue  # The next follower in becomes the leader
+            if call.error is not None:
+                raise call.error
+            return call.result, not leader
+
+    def _run(self, key, call, fn):
+        def emit(text):
+            with call.changed:
+                call.text = text
+                call.changed.notify_all()
+
+        try:
+            call.result = fn(emit)
+        except Exception as e:
+            call.error = e
+        except BaseException as e:
+            call.error = e  # Not an answer to share, only the leader sees it
+            call.abandoned = True
+        finally:
+            with self._lock:
+                del self._calls[key]
+            with call.changed:
+                call.done = True
+                call.changed.notify_all()
+
+    @staticmethod
+    def _follow(call, on_delta):
+        # Render every new text until the call is done, on the calling thread
+        shown = None
+        while True:
+            with call.changed:
+                while not call.done and call.text is shown:
+                    call.changed.wait()
+                text, done = call.text, call.done
+            if on_delta and text is not None and text is not shown:
+                on_delta(text)
+            shown = text
+            if done:
+                return
+
+    async def ado(self, key, coroutine_fn):
+        """Async do(). The upstream call runs as its own task, so one caller giving up doesn't cancel it for the rest."""
+        task = self._tasks.get(key)  # Only touched from the event loop thread
+        leader = task is None
+        if leader:
+            task = self._tasks[key] = asyncio.ensure_future(coroutine_fn())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        self._count(leader)
+
+        if leader:
+            return await asyncio.shield(task), False
+        self._wait(+1)
+        try:
+            return await asyncio.shield(task), True
+        finally:
+            self._wait(-1)
+
+
+# One per process, shared by every session and request
+single_flight = SingleFlight()
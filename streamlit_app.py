@@ -1,201 +1,79 @@
+import time
+APP_START = time.perf_counter()
+
 import streamlit as st
 import os
-from dotenv import load_dotenv
-from litellm import completion
-from sentence_transformers import SentenceTransformer, util
-import random
-import json
-
-# Load API Key
-try:
-    load_dotenv()
-    GROQ_KEY = os.getenv("GROQ_API_KEY")
-    OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-
-    # Setting keys by environment
-    os.environ["GROQ_API_KEY"] = GROQ_KEY
-    os.environ["OPENAI_API_KEY"] = OPENAI_KEY
-except Exception as e:
-    print(f"Could not load .env file: {e}")
-    GROQ_KEY = None
-    OPENAI_KEY = None
+import foodbot_core
+from foodbot_core import FoodBot, MODELS, Warmup
+from attribute_index import AttributeIndex
+from chat_memory import ChatMemory
+from image_cache import IMAGE_PROXY, ImageCache
+from response_cache import SemanticCache
+from metrics import Trace, metrics
+from model_router import router
+
+# Recommendation logic lives in foodbot_core.py, this file only caches and renders it.
+# Heavy parts (torch, embedding model, litellm) load on a background thread, so the page shows up first.
 
+# UI Parts (Streamlit)
 
-# Model list
-MODELS = {
-    "🧠 OpenAI GPT (gpt-4o-mini)": {
-        "id": "gpt-4o-mini",
-        "api_key": OPENAI_KEY,
-    },
-    "🦙 LLaMA 3.1 8B Instant": {
-        "id": "groq/llama-3.1-8b-instant",
-        "api_key": GROQ_KEY,
-    },
-    "🦙 LLaMA 3.3 70B Versatile": {
-        "id": "groq/llama-3.3-70b-versatile",
-        "api_key": GROQ_KEY,
-    },
-}
+st.set_page_config(page_title="FoodBot Kin-Arai-Dee 🍜", page_icon="🍽️")
+st.title("🍽 Kin-Arai-Dee FoodBot")
+st.subheader("ไม่รู้จะกินอะไรดี บอกลักษณะอาหารให้เราสิ!")
 
-# Loading model embedding
+# Cache of final AI answers shared by every session, see response_cache.py
 @st.cache_resource
-def load_rag_model():
-    return SentenceTransformer("all-MiniLM-L6-v2")
+def load_response_cache():
+    return SemanticCache(
+        threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.92")),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+        max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000")),
+        db_path=os.getenv("RESPONSE_CACHE_DB"),  # Optional SQLite file to keep answers across restarts
+    )
 
-rag_model = load_rag_model()
+response_cache = load_response_cache()
 
 # Loading menu from file menu.txt
 @st.cache_data
 def load_menu_from_txt(file_path="menu.txt"):
-    menu_knowledge = {}
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            for line in f:
-                cleaned_line = line.strip()
-                if not cleaned_line or ":" not in cleaned_line:
-                    continue  # Skip any empty or non-existent lines.
-
-                # Split menu name form other parts.
-                name_part, rest_part = cleaned_line.split(":", 1)
-                name = name_part.strip()
-                
-                # Check if it has image URL.
-                if "|" in rest_part:
-                    desc_part, img_part = rest_part.split("|", 1)
-                    desc = desc_part.strip()
-                    img_url = img_part.strip()
-                else:
-                    # If dosn't have | just leave a description.
-                    desc = rest_part.strip()
-                    img_url = None
-                
-                # Store data
-                if name:
-                    menu_knowledge[name] = {
-                        "desc": desc,
-                        "img": img_url
-                    }
+        return foodbot_core.load_menu_from_txt(file_path)
     except FileNotFoundError:
         st.error(f"ไม่พบไฟล์ {file_path}")
-    return menu_knowledge
-
+        return {}
 
 menu_knowledge = load_menu_from_txt()
 
-# Create embeddings
-@st.cache_data
-def build_menu_embeddings(menu_knowledge):
-    # Use list comprehension for confirme embedding for every menu with description
-    menu_items = {name: data["desc"] for name, data in menu_knowledge.items() if data.get("desc")}
-    return {
-        name: rag_model.encode(desc, normalize_embeddings=True)
-        for name, desc in menu_items.items()
-    }
-
-menu_embeddings = build_menu_embeddings(menu_knowledge)
-
-# Function RAG Random
-def rag_random_menu(query: str = "อยากกินอะไรดี", top_k: int = 16):
-    if not menu_embeddings:
-        return "ไม่มีเมนูให้แนะนำ", None
-
-    query_emb = rag_model.encode(query, normalize_embeddings=True)
-    sims = {name: float(util.dot_score(query_emb, emb)) for name, emb in menu_embeddings.items()}
-    
-    # Filter to only menus with similarity scores greater than 0
-    relevant_items = {name: score for name, score in sims.items() if score > 0.1}
-    if not relevant_items:
-        # If dosn't have maching menus, Random from all of it
-        relevant_items = sims
-
-    top_items = sorted(relevant_items.items(), key=lambda x: x[1], reverse=True)[:top_k]
-    
-    if not top_items:
-        return "ขออภัย ไม่มีเมนูที่เข้ากับความต้องการของคุณเลย", None
-
-    selected_menu, score = random.choice(top_items)
-    data = menu_knowledge[selected_menu]
-    desc = data.get("desc", "ไม่มีคำอธิบาย")
-    img = data.get("img") # Extract image URLs from valid data
-
-    text = f"🥢 วันนี้ลองกิน **{selected_menu}** ดูไหม?\n\n{desc}\n"
-    return text, img
-
+# Load menu data from JSON file, then compile it into attribute bitsets once
+@st.cache_resource
+def load_food_index(file_path="foodlist.json"):
+    return foodbot_core.load_food_index(file_path)
 
-# Function calling
-# Load menu data from JSON file
 try:
-    with open('foodlist.json', 'r', encoding='utf-8') as f:
-        food_data = json.load(f)
+    food_index = load_food_index()
 except FileNotFoundError:
     st.error("ไม่พบไฟล์ foodlist.json กรุณาสร้างไฟล์ข้อมูลก่อน")
-    food_data = []
-
-# Search menu function (Calling by AI)
-def search_menu(spicy: bool = None, seafood: bool = None, meat: str = None, cuisine: str = None, green_level: str = None, max_calories: int = None):
-    """
-    ค้นหาเมนูอาหารจากฐานข้อมูลตามเงื่อนไขที่กำหนด
-    
-    Args:
-        spicy (bool, optional): ต้องการอาหารรสเผ็ดหรือไม่.
-        seafood (bool, optional): ต้องการอาหารทะเลหรือไม่.
-        meat (str, optional): ประเภทของเนื้อสัตว์ที่ต้องการ เช่น 'pork', 'chicken', 'shrimp'.
-        cuisine (str, optional): ประเภทอาหาร เช่น 'thai', 'japanese', 'healthy'.
-        green_level (str, optional): ระดับการทานมังสวิรัติ 'vegetarian' หรือ 'vegan'.
-        max_calories (int, optional): ปริมาณแคลอรี่สูงสุด.
+    food_index = AttributeIndex([])
 
-    Returns:
-        list: รายชื่อเมนูที่ตรงตามเงื่อนไข
-    """
-    results = food_data
-    
-    if spicy is not None:
-        results = [item for item in results if item['spicy'] == spicy]
-    if seafood is not None:
-        results = [item for item in results if item['seafood'] == seafood]
-    if meat:
-        results = [item for item in results if meat.lower() in item['meat']]
-    if cuisine:
-        results = [item for item in results if item['cuisine'].lower() == cuisine.lower()]
-    if green_level:
-        results = [item for item in results if item['green_level'].lower() == green_level.lower()]
-    if max_calories is not None:
-        results = [item for item in results if item['avg_calories'] <= max_calories]
-        
-    if not results:
-        return ["ไม่พบเมนูที่ตรงกับความต้องการของคุณเลย ลองเปลี่ยนเงื่อนไขดูนะ"]
-        
-    # Return menu name and calories
-    return [f"{item['name']} ({item['avg_calories']} kcal)" for item in results]
+# Embedding model, embeddings, search index and tool pool are built once per process, in the background.
+# Edits to menu.txt / foodlist.json are then picked up without a restart (see catalog_watcher.py)
+@st.cache_resource
+def start_warmup(menu_knowledge, _food_index):
+    return Warmup(
+        lambda: FoodBot(foodbot_core.load_rag_model(), menu_knowledge, _food_index),
+        watch=("menu.txt", "foodlist.json"),
+    )
 
-# Define the function schema for AI to recognize (Tool Definition)
-tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": "search_menu",
-            "description": "ค้นหาเมนูอาหารจากฐานข้อมูลตามเงื่อนไขที่ผู้ใช้ระบุ เช่น รสชาติ, ประเภทเนื้อสัตว์, แคลอรี่ หรือประเภทอาหาร",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "spicy": {"type": "boolean", "description": "ต้องการอาหารรสเผ็ดหรือไม่"},
-                    "seafood": {"type": "boolean", "description": "ต้องการอาหารทะเลหรือไม่"},
-                    "meat": {"type": "string", "description": "ประเภทเนื้อสัตว์ที่ต้องการ เช่น pork, chicken, shrimp"},
-                    "cuisine": {"type": "string", "description": "ประเภทอาหาร เช่น thai, japanese, healthy"},
-                    "green_level": {"type": "string", "enum": ["vegetarian", "vegan"], "description": "สำหรับคนทานมังสวิรัติหรือวีแกน"},
-                    "max_calories": {"type": "number", "description": "ปริมาณแคลอรี่สูงสุดที่ไม่ต้องการให้เกิน"}
-                },
-                "required": [], # Make every parameter to optional
-            },
-        }
-    }
-]
+warmup = start_warmup(menu_knowledge, food_index)
 
-# UI Parts (Streamlit)
+# Menu images are shown from small local thumbnails, downloaded once in the background (see image_cache.py)
+@st.cache_resource
+def load_image_cache(image_urls):
+    image_cache = ImageCache()
+    image_cache.prefetch(image_urls)
+    return image_cache
 
-st.set_page_config(page_title="FoodBot Kin-Arai-Dee 🍜", page_icon="🍽️")
-st.title("🍽 Kin-Arai-Dee FoodBot")
-st.subheader("ไม่รู้จะกินอะไรดี บอกลักษณะอาหารให้เราสิ!")
+image_cache = load_image_cache(tuple(data["img"] for data in menu_knowledge.values() if data.get("img")))
 
 st.divider()
 
@@ -203,6 +81,20 @@ st.subheader("🤖 ให้ AI ช่วยคิดเมนู (พร้อ
 selected_model_name = st.selectbox("เลือกโมเดล AI", list(MODELS.keys()))
 model_info = MODELS[selected_model_name]
 
+# Fast mode answers simple requests straight from the database, without calling the AI
+fast_mode = st.toggle("⚡ โหมดเร็ว: ตอบจากฐานข้อมูลทันทีถ้าคำขอชัดเจน")
+
+# Chat mode remembers this session's conversation, so follow-ups like "ขอแบบไม่เผ็ด" keep their context
+chat_mode = st.toggle("💬 โหมดแชต: จำบทสนทนาก่อนหน้า")
+chat_memory = st.session_state.setdefault("chat_memory", ChatMemory())
+if chat_mode and chat_memory.turns:
+    for question, answer in chat_memory.history():
+        st.chat_message("user").write(question)
+        st.chat_message("assistant").write(answer)
+    if st.button("🧹 เริ่มบทสนทนาใหม่"):
+        st.session_state["chat_memory"] = ChatMemory()
+        st.rerun()
+
 user_input = st.text_input("พิมพ์ความคิดของคุณ:", placeholder="เช่น อยากกินอะไรแซ่บๆ ที่ไม่ใช่ทะเล, หาของกินคลีนๆให้หน่อย, ...")
 
 if st.button("🧠 ส่งให้ AI คิด"):
@@ -211,75 +103,96 @@ if st.button("🧠 ส่งให้ AI คิด"):
     elif not model_info.get("api_key"):
         st.error(f"ไม่พบ API Key สำหรับ {selected_model_name} กรุณาตั้งค่าในไฟล์ .env")
     else:
-        with st.spinner(f"🤖 {selected_model_name} กำลังคิดเมนูให้สักครู่นะ..."):
+        # Every click is traced: stage timings, tokens, tool calls, cache hits (see metrics.py)
+        with st.spinner(f"🤖 {selected_model_name} กำลังคิดเมนูให้สักครู่นะ..."), Trace("ai", model=model_info["id"]) as trace:
             try:
-                # Function calling Parts
-                
-                # Send first request to AI with tools we have
-                messages = [{"role": "user", "content": user_input}]
-                
-                first_response = completion(
-                    model=model_info["id"],
-                    messages=messages,
-                    tools=tools,
-                    tool_choice="auto", # Let AI decide to call function
-                    api_key=model_info["api_key"]
-                )
-                
-                response_message = first_response.choices[0].message
-                messages.append(response_message) # Add AI responses to history
+                # Wait for warm-up if the first click comes in before the models are ready
+                bot = warmup.wait()
+                if bot is None:
+                    raise RuntimeError(f"โหลดโมเดลไม่สำเร็จ ({warmup.error})")
+
+                # Paraphrases of a recent question reuse its answer instead of calling the AI again
+                # (not for chat follow-ups, their answer depends on the conversation)
+                use_cache = not (chat_mode and chat_memory.turns)
+                query_emb = bot.encode(user_input)
+                cached_suggestion = response_cache.get(model_info["id"], query_emb) if use_cache else None
+                if cached_suggestion:
+                    trace.mark_cache_hit()
+                    if chat_mode:
+                        chat_memory.add_turn([{"role": "user", "content": user_input},
+                                              {"role": "assistant", "content": cached_suggestion}])
+                    st.success(f"🍜 **AI แนะนำว่า:**\n\n{cached_suggestion}")
+                    st.caption("⚡ ตอบจากคำถามที่คล้ายกันเมื่อไม่นานมานี้")
+                else:
+                    # Function calling Parts
+                    
+                    # Send first request to AI with tools we have
+                    messages = [{"role": "user", "content": user_input}]
 
-                # Check if AI want to call function
-                if response_message.tool_calls:
                     info_placeholder = st.empty()  # Create empty space
                     info_placeholder2 = st.empty() 
-                    info_placeholder.info("AI กำลังค้นหาข้อมูลจากเมนู...")
-                    # Call function form AI request
-                    available_functions = {"search_menu": search_menu}
-                    tool_call = response_message.tool_calls[0]
-                    function_name = tool_call.function.name
-                    function_to_call = available_functions[function_name]
-                    function_args = json.loads(tool_call.function.arguments)
+                    answer_placeholder = st.empty()
                     
-                    # Call the local function with arguments provided by the model
-                    function_response = function_to_call(**function_args)
-                    
-                    # Send results back to AI
-                    messages.append(
-                        {
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                            "content": json.dumps(function_response, ensure_ascii=False),
-                        }
-                    )
-                    
-                    # Let AI summarize data to create a final answer
-                    info_placeholder2.info("AI กำลังเรียบเรียงคำตอบ...")
-                    final_response = completion(
-                        model=model_info["id"],
-                        messages=messages,
-                        api_key=model_info["api_key"]
-                    )
-                    ai_suggestion = final_response.choices[0].message.content
-                else:
-                    # If the AI ​​doesn't call function, use the first answer
-                    ai_suggestion = response_message.content
-                info_placeholder.empty()
-                info_placeholder2.empty()
-                st.success(f"🍜 **AI แนะนำว่า:**\n\n{ai_suggestion}")
+                    # Show tool progress, then a final answer that streams in
+                    def show_tool_calls(tool_calls):
+                        info_placeholder.info(f"AI กำลังค้นหาข้อมูลจากเมนู... ({len(tool_calls)} รายการ)")
+                        info_placeholder2.info("AI กำลังเรียบเรียงคำตอบ...")
+
+                    show_delta = lambda text: answer_placeholder.success(f"🍜 **AI แนะนำว่า:**\n\n{text}▌")
+                    intent_mode = "fast" if fast_mode else foodbot_core.INTENT_MODE
+                    if chat_mode:
+                        ai_suggestion = bot.chat(model_info, chat_memory, user_input, show_delta, show_tool_calls, intent_mode)
+                    else:
+                        ai_suggestion = bot.ask(
+                            model_info,
+                            messages,
+                            on_delta=show_delta,
+                            on_tools=show_tool_calls,
+                            intent_mode=intent_mode,
+                        )
+                    info_placeholder.empty()
+                    info_placeholder2.empty()
+                    answer_placeholder.success(f"🍜 **AI แนะนำว่า:**\n\n{ai_suggestion}")
+                    if ai_suggestion and not fast_mode and use_cache:
+                        response_cache.put(model_info["id"], query_emb, ai_suggestion)
 
             except Exception as e:
+                trace.error = f"{type(e).__name__}: {e}"
+                metrics.inc("foodbot_errors_total", stage="ai")
                 st.error(f"เกิดข้อผิดพลาดในการสื่อสารกับ AI: {e}")
                 st.warning("กรุณาลองพิมพ์อธิบายความคิดให้ชัดเจนขึ้นนะครับ 😊")
+        st.session_state["last_trace"] = trace.to_dict()
 
 st.divider()
 
 # RAG random
 st.subheader("คิดไม่ออก ไม่รู้จะกินอะไรจริงๆ")
 if st.button("🍽️ สุ่มเมนูสิ้นคิด"):
-    with st.spinner("🤖 กำลังวิเคราะห์เมนูจากไฟล์..."):
-        suggestion, img_url = rag_random_menu()
-        st.success(suggestion)
-        if img_url:
-            st.image(img_url, caption=f"ขอแนะนำ", use_container_width=True)
+    bot = warmup.bot  # Latest catalog, may be swapped by the catalog watcher at any time
+    if bot:
+        with st.spinner("🤖 กำลังวิเคราะห์เมนูจากไฟล์..."), Trace("random") as trace:
+            suggestion, img_url = bot.rag_random_menu()
+        st.session_state["last_trace"] = trace.to_dict()
+    else:
+        # Models are still warming up, pick from the whole menu for now
+        st.info("⏳ ระบบ AI กำลังเตรียมตัว ขอสุ่มจากเมนูทั้งหมดไปก่อนนะ")
+        suggestion, img_url = foodbot_core.plain_random_menu(menu_knowledge)
+    st.success(suggestion)
+    # A link that can't be fetched any more shows no image instead of a broken one
+    image = image_cache.get(img_url) if IMAGE_PROXY else img_url
+    if image:
+        st.image(image, caption=f"ขอแนะนำ", use_container_width=True)
+
+# Startup report
+render_seconds = time.perf_counter() - APP_START
+if warmup.ready.is_set():
+    st.caption(f"⏱️ โหลดหน้าเว็บ {render_seconds:.2f} วินาที · เตรียมโมเดลเสร็จใน {warmup.seconds:.1f} วินาที")
+else:
+    st.caption(f"⏱️ โหลดหน้าเว็บ {render_seconds:.2f} วินาที · กำลังเตรียมโมเดล AI...")
+
+# Debug panel, open with ?debug=1 or DEBUG_PANEL=1
+if os.getenv("DEBUG_PANEL") == "1" or st.query_params.get("debug") == "1":
+    with st.expander("🔧 Debug"):
+        st.json(st.session_state.get("last_trace", {}))
+        st.json(router.snapshot())
+        st.code(metrics.prometheus_text(), language="text")
@@ -0,0 +1,48 @@
+import hashlib
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Set before the app modules are imported: caches go to a throwaway directory,
+# litellm uses its bundled model list instead of fetching one
+os.environ.setdefault("FOODBOT_CACHE_DIR", tempfile.mkdtemp(prefix="foodbot-test-"))
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from embedding_store import EmbeddingStore  # noqa: E402
+from foodbot_core import FoodBot, load_food_index, load_menu_from_txt  # noqa: E402
+
+
+class FakeRagModel:
+    """Deterministic stand-in for the SentenceTransformer: hashed character trigrams."""
+
+    dim = 64
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _encode_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(max(1, len(text) - 2)):
+            digest = hashlib.md5(text[i:i + 3].encode("utf-8")).digest()
+            vector[digest[0] % self.dim] += 1.0
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    def encode(self, texts, batch_size=None, normalize_embeddings=True):
+        if isinstance(texts, str):
+            return self._encode_one(texts)
+        return np.stack([self._encode_one(text) for text in texts])
+
+
+@pytest.fixture
+def bot(tmp_path):
+    return FoodBot(
+        FakeRagModel(),
+        load_menu_from_txt(os.path.join(ROOT, "menu.txt")),
+        load_food_index(os.path.join(ROOT, "foodlist.json")),
+        EmbeddingStore("fake-model", cache_dir=str(tmp_path)),
+    )
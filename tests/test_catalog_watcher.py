@@ -0,0 +1,44 @@
+import functools
+import os
+import shutil
+
+import numpy as np
+
+import foodbot_core
+from catalog_watcher import CatalogWatcher
+from conftest import ROOT, FakeRagModel
+from embedding_store import EmbeddingStore
+from foodbot_core import FoodBot, load_food_index, load_menu_from_txt
+from quantized import load_or_quantize
+
+
+def test_reload_swaps_the_bot_and_prunes_the_old_catalog(tmp_path, monkeypatch):
+    # int8 copies too, so there are quantized files of the old catalog to prune
+    monkeypatch.setattr(foodbot_core, "load_or_quantize", functools.partial(load_or_quantize, precision="int8"))
+    menu_path = shutil.copy(os.path.join(ROOT, "menu.txt"), tmp_path / "menu.txt")
+    food_path = shutil.copy(os.path.join(ROOT, "foodlist.json"), tmp_path / "foodlist.json")
+    store = EmbeddingStore("fake-model", cache_dir=str(tmp_path / "cache"))
+    old_bot = FoodBot(FakeRagModel(), load_menu_from_txt(menu_path), load_food_index(food_path), store)
+    swapped = []
+    watcher = CatalogWatcher(old_bot, menu_path, food_path, interval=0, on_reload=swapped.append)
+
+    with open(menu_path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    name, rest = lines[0].split(":", 1)
+    lines[0] = f"{name}: เมนูแก้ไขใหม่ {rest}"
+    with open(menu_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    rows_before = len(store)
+    assert watcher.check()
+
+    new_bot = watcher.bot
+    assert swapped == [new_bot] and new_bot is not old_bot
+    assert watcher.last_diff["menu"]["changed"] == 1
+    assert new_bot.menu_key != old_bot.menu_key
+    names = os.listdir(store.path)
+    assert not [n for n in names if old_bot.menu_key[:16] in n]
+    assert [n for n in names if n.startswith(f"index-{new_bot.menu_key[:16]}")]
+    assert len(store) == rows_before  # One new vector, the replaced one compacted away
+    # The old bot still answers from the files it mapped before they were removed
+    assert np.asarray(old_bot.menu_matrix).shape == np.asarray(new_bot.menu_matrix).shape
+    assert old_bot.rag_random_menu("ต้มยำ")[0]
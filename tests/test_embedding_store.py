@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+
+from conftest import FakeRagModel
+from embedding_store import EmbeddingStore
+
+
+def encode(texts):
+    return FakeRagModel().encode(texts)
+
+
+def test_compact_keeps_live_rows_in_catalog_order(tmp_path):
+    store = EmbeddingStore("fake-model", cache_dir=str(tmp_path))
+    before = store.get(["ต้มยำกุ้ง", "ข้าวมันไก่", "ผัดไทย"], encode)
+    # Edit one description: its new vector is appended, the old one stays behind
+    catalog = ["ต้มยำกุ้ง", "ข้าวมันไก่ทอด", "ผัดไทย"]
+    edited = store.get(catalog, encode)
+    assert len(store) == 4
+    assert not isinstance(edited.base, np.memmap)  # Rows are no longer one block, get() copied
+
+    assert store.compact(catalog) == 1
+    assert len(store) == 3
+    compacted = store.get(catalog, encode)
+    assert isinstance(compacted.base, np.memmap)
+    np.testing.assert_array_equal(compacted, edited)
+    np.testing.assert_array_equal(before[[0, 2]], compacted[[0, 2]])  # Mapped before the compaction, still readable
+    assert [name for name in os.listdir(store.path) if name.endswith(".f32")] == [os.path.basename(store.vectors_path)]
+
+    assert store.compact(catalog) == 0
+    reopened = EmbeddingStore("fake-model", cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(reopened.get(catalog, lambda texts: 1 / 0), edited)
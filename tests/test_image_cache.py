@@ -0,0 +1,106 @@
+import io
+import os
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+import image_cache
+from image_cache import ImageCache
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def png(seed, size=256):
+    # Noise, so every image (and its thumbnail) is a different, not too small file
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    out = io.BytesIO()
+    Image.fromarray(pixels).save(out, "PNG")
+    return out.getvalue()
+
+
+@pytest.fixture
+def server():
+    """Local stand-in for the image hosts: serves .files, counts requests in .hits."""
+    files = {}
+    hits = Counter()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[self.path] += 1
+            if self.path not in files:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.end_headers()
+            self.wfile.write(files[self.path])
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    httpd.files, httpd.hits = files, hits
+    httpd.url = lambda path: f"http://127.0.0.1:{httpd.server_port}{path}"
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def blobs(cache):
+    return sorted(os.listdir(cache.blob_dir))
+
+
+def test_download_then_cache_hit(server, tmp_path):
+    server.files["/a.png"] = png(0, size=1000)
+    cache = ImageCache(str(tmp_path), max_size=128)
+    path = cache.get(server.url("/a.png"))
+    assert path and cache.get(server.url("/a.png")) == path
+    assert server.hits["/a.png"] == 1
+    with Image.open(path) as thumbnail:
+        assert thumbnail.format == "JPEG" and max(thumbnail.size) == 128
+    # A new instance (restart, another worker) finds it on disk
+    assert ImageCache(str(tmp_path), max_size=128).cached(server.url("/a.png")) == path
+
+
+def test_urls_of_the_same_image_share_one_blob(server, tmp_path):
+    server.files["/a.png"] = server.files["/mirror/a.png"] = png(0)
+    cache = ImageCache(str(tmp_path), max_size=64)
+    assert cache.get(server.url("/a.png")) == cache.get(server.url("/mirror/a.png"))
+    assert len(blobs(cache)) == 1
+    assert len(os.listdir(cache.ref_dir)) == 2
+
+
+def test_least_recently_used_blobs_are_evicted_past_max_mb(server, tmp_path):
+    for name in "abc":
+        server.files[f"/{name}.png"] = png(ord(name))
+    cache = ImageCache(str(tmp_path), max_size=64)
+    a, b = cache.get(server.url("/a.png")), cache.get(server.url("/b.png"))
+    os.utime(a, (1, 1))
+    os.utime(b, (2, 2))
+    cache.cached(server.url("/a.png"))  # Using a makes b the least recently used one
+
+    c_size = len(image_cache.make_thumbnail(server.files["/c.png"], 64))
+    cache.max_bytes = os.path.getsize(a) + c_size  # Room for two thumbnails
+    c = cache.get(server.url("/c.png"))
+    assert blobs(cache) == sorted(os.path.basename(path) for path in (a, c))
+
+    assert cache.get(server.url("/b.png")) == b  # Evicted, so downloaded again
+    assert server.hits["/b.png"] == 2
+
+
+def test_missing_images_are_not_retried_until_the_failure_ttl(server, tmp_path, monkeypatch):
+    cache = ImageCache(str(tmp_path), max_size=64)
+    url = server.url("/gone.png")
+    assert cache.get(url) is None
+    assert cache.get(url) is None
+    assert server.hits["/gone.png"] == 1
+
+    server.files["/gone.png"] = png(1)
+    monkeypatch.setattr(image_cache, "FAILURE_TTL", 0)  # The failure has expired
+    assert cache.get(url)
+    assert server.hits["/gone.png"] == 2
+    assert cache.get(None) is None
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from conftest import ROOT
+from intent import IntentParser
+
+
+@pytest.fixture(scope="module")
+def parser():
+    with open(os.path.join(ROOT, "foodlist.json"), "r", encoding="utf-8") as f:
+        return IntentParser(json.load(f))
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("อยากกินหมูไม่เผ็ด", {"meat": "pork", "spicy": False}),
+    ("อยากกินอาหารญี่ปุ่น", {"cuisine": "japanese"}),
+    ("อยากกินไก่ไม่เกิน 500 kcal", {"meat": "chicken", "max_calories": 500}),
+    ("spicy chicken under 500 kcal", {"meat": "chicken", "spicy": True, "max_calories": 500}),
+    ("ไม่เอาทะเล", {"seafood": False}),
+    ("ไม่กินทะเล", {"seafood": False}),
+    ("ไม่เอาอาหารทะเล เผ็ดๆ", {"seafood": False, "spicy": True}),
+    ("not spicy thai food", {"spicy": False, "cuisine": "thai"}),
+    ("I want something spicy", {"spicy": True}),
+])
+def test_parses_simple_requests(parser, text, expected):
+    assert parser.parse(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "ไม่อยากกินหมู",  # Not wanting pork is not a pork filter
+    "ไม่เอาหมู",
+    "ไม่ชอบหมู",
+    "อยากกินไก่เกิน 500 kcal",  # A lower bound, max_calories would invert it
+    "อยากกินไก่มากกว่า 500 kcal",
+    "chicken over 500 kcal",
+    "อยากกินหมู ยกเว้นทอด",
+    "อยากกินอะไรที่ไม่มีหมู",  # Negations the keywords don't cover must not flip into the filter
+    "อยากกินอาหารไม่มีหมู",
+    "อยากกินอาหารไม่มีกุ้ง",
+    "อยากกินอาหารไม่มีเผ็ด",
+    "ห้ามมีกุ้ง",
+    "อาหารปลอดหมู",
+    "no spicy food please",
+    "non-spicy thai food",
+    "I want something with no pork please",
+    "pork-free please",
+    "อยากกินอาหารเจ",
+    "อยากกินอะไรดี",  # Nothing to filter on
+    "ผัดกะเพราหมูกรอบใส่ไข่ดาว",  # Mostly words the parser doesn't know
+])
+def test_leaves_the_rest_to_the_llm(parser, text):
+    assert parser.parse(text) is None
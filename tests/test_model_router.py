@@ -0,0 +1,143 @@
+import asyncio
+import time
+
+import pytest
+from aiohttp.test_utils import TestServer
+
+import mock_llm
+from foodbot_core import acomplete
+from model_router import ModelRouter
+
+FAST = {"id": "fast"}
+SLOW = {"id": "slow"}
+LIMITED = {"id": "limited"}
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def provider(delays, failures=()):
+    """Fake provider for run(): answers with the model id after delays[id] seconds."""
+    def call(model_info, claim, emit):
+        time.sleep(delays.get(model_info["id"], 0))
+        if model_info["id"] in failures:
+            raise RateLimited("rate limited")
+        if not claim():
+            return None
+        emit(model_info["id"])
+        return model_info["id"]
+    return call
+
+
+def async_provider(delays, failures=()):
+    async def call(model_info):
+        await asyncio.sleep(delays.get(model_info["id"], 0))
+        if model_info["id"] in failures:
+            raise RateLimited("rate limited")
+        return model_info["id"]
+    return call
+
+
+def prefer(router, model_info):
+    # One quick success, so model_info is ranked first
+    router.record(model_info["id"], 0.01)
+
+
+def test_hedge_fires_after_delay_and_the_loser_is_not_a_sample():
+    router = ModelRouter(hedge_delay=0.05, timeout=5)
+    prefer(router, SLOW)
+    deltas = []
+    start = time.monotonic()
+    winner, result = router.run([FAST, SLOW], provider({"slow": 0.5, "fast": 0.0}), deltas.append)
+    assert (winner, result, deltas) == (FAST, "fast", ["fast"])
+    assert 0.05 <= time.monotonic() - start < 0.4
+
+    time.sleep(0.6)  # Let the slow attempt finish and lose its claim
+    assert list(router.stats["slow"].latencies) == [0.01]
+    assert router.snapshot()["slow"]["samples"] == 1
+
+
+def test_no_hedge_when_the_first_model_answers_in_time():
+    router = ModelRouter(hedge_delay=0.2, timeout=5)
+    prefer(router, FAST)
+    calls = []
+
+    def call(model_info, claim, emit):
+        calls.append(model_info["id"])
+        return provider({})(model_info, claim, emit)
+
+    assert router.run([SLOW, FAST], call)[0] == FAST
+    assert calls == ["fast"]
+
+
+def test_failover_on_429_and_cooldown_ranks_it_last():
+    router = ModelRouter(hedge_delay=5, timeout=5, cooldown=30)
+    prefer(router, LIMITED)
+    assert router.run([LIMITED, FAST], provider({}, failures={"limited"}))[0] == FAST
+    snapshot = router.snapshot()
+    assert snapshot["limited"]["cooling_down"] and snapshot["limited"]["error_rate"] == 0.5
+    # Still the lowest latency, but cooling down goes after everything else
+    prefer(router, LIMITED)
+    assert router.ranked([LIMITED, FAST]) == [FAST, LIMITED]
+
+
+def test_timeout_when_no_model_answers():
+    router = ModelRouter(hedge_delay=0.02, timeout=0.2)
+    with pytest.raises(TimeoutError):
+        router.run([SLOW, FAST], provider({"slow": 1, "fast": 1}))
+
+
+def test_every_model_failing_raises_the_last_error():
+    router = ModelRouter(hedge_delay=5, timeout=5)
+    with pytest.raises(RateLimited):
+        router.run([LIMITED], provider({}, failures={"limited"}))
+
+
+def test_async_hedge_cancels_the_loser():
+    router = ModelRouter(hedge_delay=0.05, timeout=5)
+    prefer(router, SLOW)
+    start = time.monotonic()
+    winner, result = asyncio.run(router.arun([FAST, SLOW], async_provider({"slow": 1, "fast": 0})))
+    assert (winner, result) == (FAST, "fast")
+    assert time.monotonic() - start < 0.5
+    assert list(router.stats["slow"].latencies) == [0.01]
+    assert list(router.stats["slow"].outcomes) == [True]
+
+
+def test_async_failover_on_429():
+    router = ModelRouter(hedge_delay=5, timeout=5, cooldown=30)
+    prefer(router, LIMITED)
+    winner, _ = asyncio.run(router.arun([LIMITED, FAST], async_provider({}, failures={"limited"})))
+    assert winner == FAST
+    assert router.snapshot()["limited"]["cooling_down"]
+
+
+def test_async_timeout():
+    router = ModelRouter(hedge_delay=0.02, timeout=0.1)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(router.arun([SLOW, FAST], async_provider({"slow": 1, "fast": 1})))
+
+
+def test_auto_model_fails_over_against_the_mock_provider(monkeypatch):
+    router = ModelRouter(hedge_delay=5, timeout=10, cooldown=30)
+    monkeypatch.setattr("foodbot_core.router", router)
+
+    async def run():
+        # gpt-4o-mini always answers 429, gpt-4.1-mini is healthy
+        server = TestServer(mock_llm.create_app(faults=mock_llm.parse_faults(fail=["gpt-4o-mini=1.0:429"])))
+        await server.start_server()
+        try:
+            base = str(server.make_url("/v1"))
+            candidates = [{"id": model_id, "api_key": "mock", "api_base": base}
+                          for model_id in ("gpt-4o-mini", "gpt-4.1-mini")]
+            prefer(router, candidates[0])
+            auto = {"id": "auto", "candidates": candidates}
+            return await acomplete(auto, messages=[{"role": "user", "content": "อยากกินอะไรดี"}], num_retries=0)
+        finally:
+            await server.close()
+
+    response = asyncio.run(run())
+    assert response.choices[0].message.content
+    assert router.snapshot()["gpt-4o-mini"]["cooling_down"]
+    assert router.snapshot()["gpt-4.1-mini"]["error_rate"] == 0.0
@@ -0,0 +1,173 @@
+import asyncio
+import contextlib
+import threading
+
+import numpy as np
+from aiohttp.test_utils import TestClient, TestServer
+
+import mock_llm
+import service
+from ann_index import top_k_indices
+from chat_memory import ChatMemory
+from response_cache import SemanticCache
+
+
+async def post_all(app, path, bodies):
+    """(status, json) of every body POSTed to path, on one running app."""
+    results = []
+    async with TestClient(TestServer(app)) as client:
+        for body in bodies:
+            response = await client.post(path, json=body)
+            results.append((response.status, await response.json()))
+    return results
+
+
+@contextlib.asynccontextmanager
+async def service_client(bot, monkeypatch, **mock_args):
+    """Client of the service with every model pointed at a mock_llm server."""
+    llm = TestServer(mock_llm.create_app(**mock_args))
+    await llm.start_server()
+    monkeypatch.setattr(service, "LLM_API_BASE", str(llm.make_url("/v1")))
+    try:
+        async with TestClient(TestServer(service.create_app(bot, SemanticCache()))) as client:
+            yield client
+    finally:
+        await llm.close()
+
+
+async def post_json(client, path, body):
+    response = await client.post(path, json=body)
+    return response.status, await response.json()
+
+
+def test_retrieve_applies_filters(bot):
+    [(status, body)] = asyncio.run(post_all(service.create_app(bot), "/retrieve",
+                                            [{"query": "ต้มยำ", "top_k": 5, "seafood": True}]))
+    assert status == 200
+    assert 0 < len(body["results"]) <= 5
+    assert all(item["seafood"] for item in body["results"])
+    scores = [item["score"] for item in body["results"]]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_retrieve_rejects_bad_arguments(bot):
+    bodies = [{"query": "ต้มยำ", "top_k": 0}, {"query": "ต้มยำ", "top_k": -1}, {"query": "ต้มยำ", "top_k": "abc"},
+              {"query": "ต้มยำ", "color": "red"}, {"top_k": 3}]
+    results = asyncio.run(post_all(service.create_app(bot), "/retrieve", bodies))
+    assert [status for status, _ in results] == [400] * len(bodies)
+
+
+def test_top_k_never_returns_more_than_asked():
+    scores = np.arange(10, dtype=np.float32)
+    assert top_k_indices(scores, 3).tolist() == [9, 8, 7]
+    assert top_k_indices(scores, 0).tolist() == [9]
+    assert top_k_indices(scores, -1).tolist() == [9]
+    assert top_k_indices(scores, 20).tolist() == list(range(9, -1, -1))
+
+
+def test_search_pages_and_rejects_bad_arguments(bot):
+    bodies = [{"meat": "pork", "query": "หมูกรอบ", "limit": 2}, {"limit": "abc"}, {"offset": "x"}, {"color": "red"}]
+    results = asyncio.run(post_all(service.create_app(bot), "/search", bodies))
+    status, body = results[0]
+    assert status == 200
+    assert len(body["results"]["items"]) == 2
+    assert body["results"]["next_offset"] == 2
+    assert [status for status, _ in results[1:]] == [400, 400, 400]
+
+
+def test_recommend_runs_the_tool_loop_against_the_mock(bot, monkeypatch):
+    async def run():
+        async with service_client(bot, monkeypatch) as client:
+            body = {"prompt": "อยากกินหมูทอด", "model": "gpt-4o-mini", "mode": "off"}
+            return [await post_json(client, "/recommend", body), await post_json(client, "/recommend", body)]
+
+    (status, first), (_, second) = asyncio.run(run())
+    assert status == 200
+    # The mock asks for search_menu(meat="pork") and then recommends the first result
+    pork = {item["name"] for item in bot.food_data if "pork" in item["meat"]}
+    assert first["answer"].startswith("ลองกิน") and any(name in first["answer"] for name in pork)
+    assert first["cached"] is False
+    assert second == {**first, "cached": True}
+
+
+def test_recommend_fast_mode_answers_without_the_llm(bot, monkeypatch):
+    bot.intent_parser.encode = None  # The fake embedding model can't judge "looks like a food request"
+
+    async def run():
+        # Every LLM call would fail, so an answer proves none was made
+        async with service_client(bot, monkeypatch, faults=mock_llm.parse_faults(fail=["gpt=1.0:500"])) as client:
+            return await post_json(client, "/recommend",
+                                   {"prompt": "อยากกินหมูไม่เผ็ด", "model": "gpt-4o-mini", "mode": "fast"})
+
+    status, body = asyncio.run(run())
+    assert status == 200
+    assert body["answer"].startswith("🍽️")
+
+
+def test_recommend_rejects_bad_requests(bot, monkeypatch):
+    async def run():
+        async with service_client(bot, monkeypatch) as client:
+            return [await post_json(client, "/recommend", body) for body in (
+                {"prompt": "  "}, {"prompt": "อยากกินหมู", "mode": "turbo"},
+            )]
+
+    assert [status for status, _ in asyncio.run(run())] == [400, 400]
+
+
+def test_chat_keeps_the_session_history(bot, monkeypatch):
+    bot.intent_parser.encode = None
+
+    async def run():
+        async with service_client(bot, monkeypatch) as client:
+            turns = []
+            for prompt in ("อยากกินหมู", "ขอแบบไม่เผ็ด"):
+                turns.append(await post_json(client, "/chat", {
+                    "session": "s1", "prompt": prompt, "model": "gpt-4o-mini", "mode": "fast"}))
+            turns.append(await post_json(client, "/chat", {"session": "s2", "prompt": "หิวแล้ว", "model": "gpt-4o-mini"}))
+            turns.append(await post_json(client, "/chat", {"prompt": "หิวแล้ว"}))
+            return turns
+
+    (_, first), (_, follow_up), (_, other), (status, _) = asyncio.run(run())
+    assert first["turns"] == 1 and follow_up["turns"] == 2 and other["turns"] == 1
+    # The follow-up narrows the pork search, answered locally from pork dishes that aren't spicy
+    mild_pork = {item["name"] for item in bot.food_data if "pork" in item["meat"] and not item["spicy"]}
+    assert follow_up["answer"].startswith("🍽️")
+    assert all(line.split("**")[1] in mild_pork for line in follow_up["answer"].splitlines() if "**" in line)
+    assert status == 400  # No session
+
+
+def test_chat_turns_of_one_session_run_in_order_off_the_event_loop(bot, monkeypatch):
+    bot.intent_parser.encode = None
+    parse = bot.intent_parser.parse
+    parse_threads = []
+    monkeypatch.setattr(bot.intent_parser, "parse", lambda text: parse_threads.append(
+        threading.current_thread()) or parse(text))
+    messages = ChatMemory.messages
+    turns_seen = []
+    monkeypatch.setattr(ChatMemory, "messages", lambda self, text: turns_seen.append(len(self.turns)) or messages(self, text))
+
+    async def run():
+        async with service_client(bot, monkeypatch, delay=0.1) as client:
+            return await asyncio.gather(*[post_json(client, "/chat", {
+                "session": "s1", "prompt": prompt, "model": "gpt-4o-mini", "mode": "assist"})
+                for prompt in ("อยากกินหมู", "ขอแบบไม่เผ็ด", "มีอะไรอีกไหม")])
+
+    results = asyncio.run(run())
+    assert sorted(body["turns"] for _, body in results) == [1, 2, 3]
+    assert turns_seen == [0, 1, 2]  # Every turn saw the ones before it
+    assert parse_threads and threading.main_thread() not in parse_threads
+
+
+def test_chat_negated_follow_up_goes_to_the_llm(bot, monkeypatch):
+    bot.intent_parser.encode = None
+
+    async def run():
+        async with service_client(bot, monkeypatch) as client:
+            return [await post_json(client, "/chat", {
+                "session": "s1", "prompt": prompt, "model": "gpt-4o-mini", "mode": "fast"})
+                for prompt in ("อยากกินอาหารทะเล", "ขอแบบที่ไม่มีกุ้ง")]
+
+    (_, first), (status, follow_up) = asyncio.run(run())
+    assert first["answer"].startswith("🍽️")  # Parsed locally
+    # "Without shrimp" is not a shrimp filter on top of seafood, the mock LLM answers it
+    assert status == 200 and follow_up["answer"].startswith("ลองกิน")
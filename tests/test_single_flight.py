@@ -0,0 +1,124 @@
+import threading
+import time
+
+from single_flight import SingleFlight
+
+
+class Stop(BaseException):
+    """Like Streamlit's StopException: raised when a user interrupts their script."""
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def in_thread(fn):
+    outcome = {}
+
+    def run():
+        try:
+            outcome["result"] = fn()
+        except BaseException as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread, outcome
+
+
+def test_identical_calls_share_one_result_and_stream_to_each_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    deltas = {"leader": [], "follower": []}
+
+    def fn(emit):
+        calls.append(1)
+        emit("ลอง")
+        release.wait(5)
+        emit("ลองกิน")
+        return "answer"
+
+    leader, leader_out = in_thread(lambda: flight.do("k", fn, deltas["leader"].append))
+    wait_for(lambda: calls)
+    follower, follower_out = in_thread(lambda: flight.do("k", fn, deltas["follower"].append))
+    wait_for(lambda: flight.waiting == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert (leader_out["result"], follower_out["result"]) == (("answer", False), ("answer", True))
+    assert len(calls) == 1
+    assert deltas["leader"][-1] == deltas["follower"][-1] == "ลองกิน"
+
+
+def test_exceptions_are_shared():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fn(emit):
+        release.wait(5)
+        raise ValueError("upstream 400")
+
+    leader, leader_out = in_thread(lambda: flight.do("k", fn))
+    wait_for(lambda: "k" in flight._calls)
+    follower, follower_out = in_thread(lambda: flight.do("k", fn))
+    wait_for(lambda: flight.waiting == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert isinstance(leader_out["error"], ValueError) and follower_out["error"] is leader_out["error"]
+
+
+def test_base_exception_in_the_call_goes_to_the_leader_and_followers_start_over():
+    flight = SingleFlight()
+    calls = []
+
+    def fn(emit):
+        calls.append(1)
+        if len(calls) == 1:
+            wait_for(lambda: flight.waiting == 1)
+            raise Stop()
+        return "answer"
+
+    leader, leader_out = in_thread(lambda: flight.do("k", fn))
+    wait_for(lambda: calls)
+    follower, follower_out = in_thread(lambda: flight.do("k", fn))
+    leader.join(5)
+    follower.join(5)
+
+    assert isinstance(leader_out["error"], Stop)
+    assert follower_out["result"] == ("answer", False)  # Led the second call
+    assert len(calls) == 2
+    assert not flight._calls
+
+
+def test_a_callers_ui_interrupt_stays_with_that_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+    follower_deltas = []
+
+    def fn(emit):
+        emit("ลอง")
+        release.wait(5)
+        emit("ลองกิน")
+        return "answer"
+
+    def interrupted(text):
+        raise Stop()
+
+    leader, leader_out = in_thread(lambda: flight.do("k", fn, interrupted))
+    wait_for(lambda: "error" in leader_out)
+    follower, follower_out = in_thread(lambda: flight.do("k", fn, follower_deltas.append))
+    wait_for(lambda: flight.waiting == 1)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert isinstance(leader_out["error"], Stop)
+    assert follower_out["result"] == ("answer", True)
+    assert follower_deltas == ["ลอง", "ลองกิน"]
+